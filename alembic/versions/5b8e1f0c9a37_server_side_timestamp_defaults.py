@@ -0,0 +1,36 @@
+"""server side timestamp defaults
+
+Revision ID: 5b8e1f0c9a37
+Revises: 22e2f4ab75ac
+Create Date: 2026-10-15 22:48:12.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e1f0c9a37'
+down_revision: Union[str, Sequence[str], None] = '22e2f4ab75ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UTC_NOW = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('events', 'timestamp', server_default=UTC_NOW)
+    op.alter_column('assignments', 'assignment_timestamp', server_default=UTC_NOW)
+    op.alter_column('experiments', 'start_time', server_default=UTC_NOW)
+    op.alter_column('experiments', 'updated_at', server_default=UTC_NOW)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('experiments', 'updated_at', server_default=None)
+    op.alter_column('experiments', 'start_time', server_default=None)
+    op.alter_column('assignments', 'assignment_timestamp', server_default=None)
+    op.alter_column('events', 'timestamp', server_default=None)
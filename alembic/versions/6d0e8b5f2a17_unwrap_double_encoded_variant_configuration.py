@@ -0,0 +1,36 @@
+"""unwrap double encoded variant configuration
+
+Revision ID: 6d0e8b5f2a17
+Revises: 3a9f6e1b7c24
+Create Date: 2026-10-15 23:24:31.085216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d0e8b5f2a17'
+down_revision: Union[str, Sequence[str], None] = '3a9f6e1b7c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # configuration_json used to be json.dumps()-ed before being bound to the JSONB
+    # column, so it was stored as a JSON string holding the document text
+    op.execute(
+        "UPDATE variants SET configuration_json = (configuration_json #>> '{}')::jsonb "
+        "WHERE jsonb_typeof(configuration_json) = 'string'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE variants SET configuration_json = to_jsonb(configuration_json::text) "
+        "WHERE configuration_json IS NOT NULL"
+    )
@@ -0,0 +1,39 @@
+"""covering indexes for results aggregation
+
+Revision ID: 8e5c2a7d3f90
+Revises: f3b9a6c2d814
+Create Date: 2026-10-16 00:41:52.118407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e5c2a7d3f90'
+down_revision: Union[str, Sequence[str], None] = 'f3b9a6c2d814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps events/assignments writable during the build, but cannot run
+    # inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_events_exp_type_user_ts', 'events', ['experiment_id', 'type_id', 'user_id', 'timestamp'], unique=False, postgresql_concurrently=True)
+        # build the covering replacement under a temporary name, then swap it in
+        op.create_index('ix_assignments_exp_user_new', 'assignments', ['experiment_id', 'user_id'], unique=True, postgresql_include=['variant_id', 'assignment_timestamp'], postgresql_concurrently=True)
+        op.drop_index('ix_assignments_exp_user', table_name='assignments', postgresql_concurrently=True)
+    op.execute('ALTER INDEX ix_assignments_exp_user_new RENAME TO ix_assignments_exp_user')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_assignments_exp_user_old', 'assignments', ['experiment_id', 'user_id'], unique=True, postgresql_concurrently=True)
+        op.drop_index('ix_assignments_exp_user', table_name='assignments', postgresql_concurrently=True)
+        op.drop_index('ix_events_exp_type_user_ts', table_name='events', postgresql_concurrently=True)
+    op.execute('ALTER INDEX ix_assignments_exp_user_old RENAME TO ix_assignments_exp_user')
@@ -0,0 +1,36 @@
+"""store event_id as uuid
+
+Revision ID: 9c3d7e2a4f61
+Revises: 5b8e1f0c9a37
+Create Date: 2026-10-15 22:52:40.187342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d7e2a4f61'
+down_revision: Union[str, Sequence[str], None] = '5b8e1f0c9a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('events', 'event_id',
+               existing_type=sa.VARCHAR(),
+               type_=sa.Uuid(),
+               existing_nullable=False,
+               postgresql_using='event_id::uuid')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('events', 'event_id',
+               existing_type=sa.Uuid(),
+               type_=sa.VARCHAR(),
+               existing_nullable=False,
+               postgresql_using='event_id::text')
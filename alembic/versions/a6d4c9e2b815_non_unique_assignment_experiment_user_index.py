@@ -0,0 +1,36 @@
+"""non-unique assignment experiment user index
+
+Revision ID: a6d4c9e2b815
+Revises: 8e5c2a7d3f90
+Create Date: 2026-10-16 09:14:27.502931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d4c9e2b815'
+down_revision: Union[str, Sequence[str], None] = '8e5c2a7d3f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # assignment_pk already enforces (user_id, experiment_id) uniqueness and is the
+    # ON CONFLICT arbiter, so the covering index does not need to check it a second time
+    with op.get_context().autocommit_block():
+        op.create_index('ix_assignments_exp_user_new', 'assignments', ['experiment_id', 'user_id'], unique=False, postgresql_include=['variant_id', 'assignment_timestamp'], postgresql_concurrently=True)
+        op.drop_index('ix_assignments_exp_user', table_name='assignments', postgresql_concurrently=True)
+    op.execute('ALTER INDEX ix_assignments_exp_user_new RENAME TO ix_assignments_exp_user')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_assignments_exp_user_old', 'assignments', ['experiment_id', 'user_id'], unique=True, postgresql_include=['variant_id', 'assignment_timestamp'], postgresql_concurrently=True)
+        op.drop_index('ix_assignments_exp_user', table_name='assignments', postgresql_concurrently=True)
+    op.execute('ALTER INDEX ix_assignments_exp_user_old RENAME TO ix_assignments_exp_user')
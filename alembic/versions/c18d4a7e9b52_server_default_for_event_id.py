@@ -0,0 +1,28 @@
+"""server default for event_id
+
+Revision ID: c18d4a7e9b52
+Revises: 6d0e8b5f2a17
+Create Date: 2026-10-15 23:31:09.772640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c18d4a7e9b52'
+down_revision: Union[str, Sequence[str], None] = '6d0e8b5f2a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('events', 'event_id', server_default=sa.text('gen_random_uuid()'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('events', 'event_id', server_default=None)
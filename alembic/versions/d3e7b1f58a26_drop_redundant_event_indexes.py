@@ -0,0 +1,35 @@
+"""drop redundant event indexes
+
+Revision ID: d3e7b1f58a26
+Revises: a6d4c9e2b815
+Create Date: 2026-10-16 09:32:08.664180
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3e7b1f58a26'
+down_revision: Union[str, Sequence[str], None] = 'a6d4c9e2b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_events_exp_type_user_ts serves every (experiment_id, type_id) lookup the
+    # narrower composite did, and events_pkey already indexes event_id; each dropped
+    # index was one more write per inserted event
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_events_exp_type_ts', table_name='events', postgresql_concurrently=True)
+        op.drop_index('ix_events_event_id', table_name='events', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_events_event_id', 'events', ['event_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_events_exp_type_ts', 'events', ['experiment_id', 'type_id', 'timestamp'], unique=False, postgresql_concurrently=True)
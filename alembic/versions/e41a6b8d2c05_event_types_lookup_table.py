@@ -0,0 +1,61 @@
+"""event types lookup table
+
+Revision ID: e41a6b8d2c05
+Revises: 9c3d7e2a4f61
+Create Date: 2026-10-15 22:58:03.644107
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a6b8d2c05'
+down_revision: Union[str, Sequence[str], None] = '9c3d7e2a4f61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_types',
+    sa.Column('event_type_id', sa.SmallInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('event_type_id'),
+    sa.UniqueConstraint('name')
+    )
+    op.add_column('events', sa.Column('type_id', sa.SmallInteger(), nullable=True))
+
+    # backfill: one lookup row per distinct existing type name
+    op.execute("INSERT INTO event_types (name) SELECT DISTINCT type FROM events")
+    op.execute(
+        "UPDATE events SET type_id = event_types.event_type_id "
+        "FROM event_types WHERE event_types.name = events.type"
+    )
+
+    op.alter_column('events', 'type_id', nullable=False)
+    op.create_foreign_key(None, 'events', 'event_types', ['type_id'], ['event_type_id'])
+    op.drop_index('ix_events_exp_type_ts', table_name='events')
+    op.drop_index(op.f('ix_events_type'), table_name='events')
+    op.create_index(op.f('ix_events_type_id'), 'events', ['type_id'], unique=False)
+    op.create_index('ix_events_exp_type_ts', 'events', ['experiment_id', 'type_id', 'timestamp'], unique=False)
+    op.drop_column('events', 'type')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('events', sa.Column('type', sa.VARCHAR(), nullable=True))
+    op.execute(
+        "UPDATE events SET type = event_types.name "
+        "FROM event_types WHERE event_types.event_type_id = events.type_id"
+    )
+    op.alter_column('events', 'type', nullable=False)
+    op.drop_index('ix_events_exp_type_ts', table_name='events')
+    op.drop_index(op.f('ix_events_type_id'), table_name='events')
+    op.create_index(op.f('ix_events_type'), 'events', ['type'], unique=False)
+    op.create_index('ix_events_exp_type_ts', 'events', ['experiment_id', 'type', 'timestamp'], unique=False)
+    op.drop_constraint('events_type_id_fkey', 'events', type_='foreignkey')
+    op.drop_column('events', 'type_id')
+    op.drop_table('event_types')
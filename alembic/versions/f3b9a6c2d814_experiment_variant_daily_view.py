@@ -0,0 +1,76 @@
+"""experiment variant daily materialized view
+
+Revision ID: f3b9a6c2d814
+Revises: c18d4a7e9b52
+Create Date: 2026-10-16 00:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9a6c2d814'
+down_revision: Union[str, Sequence[str], None] = 'c18d4a7e9b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per (experiment, variant, day, event type) aggregates of post-assignment events,
+    # covering whole UTC days before the refresh. new_users counts users whose first
+    # event of that type falls on that day, so summing it over days gives exact
+    # distinct users. refreshed_through is the same on every row: the start of the
+    # UTC day of the last refresh, from which readers add live rows.
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW mv_experiment_variant_daily AS
+        WITH post_assignment AS (
+            SELECT
+                a.experiment_id,
+                a.variant_id,
+                e.type_id,
+                date_trunc('day', e.timestamp) AS day,
+                e.properties,
+                row_number() OVER (
+                    PARTITION BY e.experiment_id, e.user_id, e.type_id
+                    ORDER BY e.timestamp
+                ) AS nth_of_type
+            FROM events e
+            JOIN assignments a
+                ON a.experiment_id = e.experiment_id AND a.user_id = e.user_id
+            WHERE e.timestamp >= a.assignment_timestamp
+                AND e.timestamp < date_trunc('day', TIMEZONE('utc', CURRENT_TIMESTAMP))
+        )
+        SELECT
+            p.experiment_id,
+            p.variant_id,
+            p.day,
+            p.type_id,
+            count(*) AS event_count,
+            count(*) FILTER (WHERE p.nth_of_type = 1) AS new_users,
+            coalesce(
+                sum(CAST(p.properties ->> 'price' AS FLOAT)) FILTER (WHERE t.name = 'purchase'),
+                0
+            ) AS revenue,
+            date_trunc('day', TIMEZONE('utc', CURRENT_TIMESTAMP)) AS refreshed_through
+        FROM post_assignment p
+        JOIN event_types t ON t.event_type_id = p.type_id
+        GROUP BY p.experiment_id, p.variant_id, p.day, p.type_id
+        """
+    )
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    op.create_index(
+        'ux_mv_experiment_variant_daily',
+        'mv_experiment_variant_daily',
+        ['experiment_id', 'variant_id', 'day', 'type_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW mv_experiment_variant_daily")
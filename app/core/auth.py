@@ -1,3 +1,7 @@
+import hashlib
+from dataclasses import dataclass
+
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated
@@ -13,7 +17,33 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 # and use a library like `python-jose` to decode the JWT token.
 
 
-def require_auth_token(token: Annotated[str, Depends(oauth2_scheme)]):
+@dataclass(frozen=True, slots=True)
+class ValidatedAuthConfig:
+    """Static auth configuration, normalized once at import time."""
+
+    tokens: frozenset[str]
+
+
+# Built once so per-request validation only does a membership check against
+# pre-resolved data instead of re-reading settings.
+AUTH_CONFIG = ValidatedAuthConfig(tokens=frozenset(config_settings.TOKENS))
+
+# Successful validations are cached by token digest so the (eventually
+# crypto/DB-backed) check runs once per token per TTL, not on every request.
+# The TTL must stay below the token lifetime once tokens carry an expiry.
+_token_cache: TTLCache = TTLCache(maxsize=100_000, ttl=300)
+
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def invalidate_cached_token(token: str) -> None:
+    """Drops a token from the validation cache; must be called when revoking a token."""
+    _token_cache.pop(_token_cache_key(token), None)
+
+
+async def require_auth_token(token: Annotated[str, Depends(oauth2_scheme)]):
     """
     Dependency function that requires a Bearer token and attempts to validate it.
 
@@ -21,6 +51,11 @@ def require_auth_token(token: Annotated[str, Depends(oauth2_scheme)]):
     a 401 Unauthorized exception.
     """
 
+    cache_key = _token_cache_key(token)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     # Placeholder for token validation and user retrieval logic:
     # -----------------------------------------------------------
 
@@ -30,7 +65,7 @@ def require_auth_token(token: Annotated[str, Depends(oauth2_scheme)]):
     # For this example, we just check if the token is present (which the
     # Depends(oauth2_scheme) already handles for the HTTP header part).
 
-    if not token or token not in config_settings.TOKENS:
+    if not token or token not in AUTH_CONFIG.tokens:
         # This part is generally redundant because oauth2_scheme handles the
         # header check, but included for complete logic flow.
         raise HTTPException(
@@ -41,4 +76,5 @@ def require_auth_token(token: Annotated[str, Depends(oauth2_scheme)]):
 
     # In a real app, you would return a User object here.
     # For demonstration, we just return the token.
+    _token_cache[cache_key] = token
     return token
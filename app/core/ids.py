@@ -0,0 +1,19 @@
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Returns a time-ordered UUIDv7 (RFC 9562): 48-bit Unix milliseconds, then random bits.
+
+    Ids generated close together sort close together, so primary key inserts append
+    to the right edge of the B-tree instead of splitting random pages.
+    """
+    if hasattr(uuid, "uuid7"):  # Python 3.14+
+        return uuid.uuid7()
+
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10))
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
@@ -0,0 +1,41 @@
+import asyncio
+
+from fastapi import HTTPException, status
+
+from .settings import config_settings
+
+
+class RequestLimiter:
+    """
+    Dependency that caps the number of in-flight requests on an endpoint.
+
+    When the cap is reached a request waits up to `timeout` seconds for a slot and
+    is then rejected with 503, so an overloaded database sheds load at the app
+    instead of piling requests up in memory and in the connection pool queue.
+    """
+
+    def __init__(self, max_in_flight: int, timeout: float):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def __call__(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry.",
+                headers={"Retry-After": "1"},
+            )
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+events_limiter = RequestLimiter(
+    max_in_flight=config_settings.EVENTS_MAX_IN_FLIGHT,
+    timeout=config_settings.EVENTS_ACQUIRE_TIMEOUT,
+)
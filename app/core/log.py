@@ -0,0 +1,26 @@
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+def configure_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Routes the "app" loggers through a queue so request handlers never block on I/O.
+
+    Log calls only enqueue the record; a QueueListener thread formats it and writes
+    to stderr. The caller owns the returned listener and must start and stop it.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    )
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level)
+    app_logger.handlers = [QueueHandler(log_queue)]
+    app_logger.propagate = False
+
+    return QueueListener(log_queue, stream_handler, respect_handler_level=True)
@@ -1,56 +1,97 @@
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import Body, FastAPI, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 import uvicorn
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.core.auth import require_auth_token
-from app.core.db import get_db
+from app.core.db import get_db, get_events_db
+from app.core.limiter import events_limiter
+from app.core.log import configure_logging
 from app.models.schemas.event import EventResponseModel, EventCreateModel
 from app.models.schemas.experiment import (
     ExperimentResponseModel,
     ExperimentCreateModel,
     AssignmentModel,
 )
+from app.services.event_batch_writer import event_batch_writer
 from app.services.event_service import EventService
+from app.services.results_view_refresher import results_view_refresher
 from fastapi import APIRouter, Depends, status, Path
 
 from app.services.experiment_service import ExperimentService
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = configure_logging()
+    log_listener.start()
+    # Background task that batches POST /events inserts; drained on shutdown
+    await event_batch_writer.start()
+    # Keeps the daily results materialized view current (Postgres only)
+    await results_view_refresher.start()
+    yield
+    await results_view_refresher.stop()
+    await event_batch_writer.stop()
+    log_listener.stop()
+
+
 # 1. Create the FastAPI application instance
 app = FastAPI(
     title="Neonblue ai assessment",
     description="Asssessment for neonblueai",
     version="0.0.1",
-    dependencies=[Depends(require_auth_token)],
+    lifespan=lifespan,
+    # orjson serializes dicts/datetimes natively, several times faster than json.dumps
+    default_response_class=ORJSONResponse,
 )
 
+# 2. Routes that require a bearer token. Auth is attached to this router rather
+# than the app so health checks skip the dependency chain entirely.
+protected = APIRouter(dependencies=[Depends(require_auth_token)])
+
+
+@app.get(
+    "/healthz",
+    status_code=status.HTTP_200_OK,
+    summary="Liveness probe",
+)
+async def get_health():
+    return {"status": "ok"}
 
-@app.post(
+
+@protected.post(
     "/experiments",
     response_model=ExperimentResponseModel,  # Defines the expected structure of the successful response
     status_code=status.HTTP_201_CREATED,
 )
-def post_experiments(
+async def post_experiments(
     experiment_data: ExperimentCreateModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     experiment_service = ExperimentService(db)
-    created_experiment = experiment_service.create_experiment(experiment_data)
+    created_experiment = await experiment_service.create_experiment(experiment_data)
     return created_experiment
 
 
-@app.get(
+@protected.get(
     "/experiments/{experiment_id}/assignment/{user_id}",
     response_model=AssignmentModel,
     status_code=status.HTTP_200_OK,
     summary="Get user assignment",
 )
-def get_user_variant_assignment(
+async def get_user_variant_assignment(
     experiment_id: str = Path(..., description="The ID of the experiment."),
     user_id: str = Path(..., description="The ID of the user."),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Retrieves a user's variant assignment. If no assignment exists, a new,
@@ -59,47 +100,94 @@ def get_user_variant_assignment(
     experiment_service = ExperimentService(db)
 
     # Delegate core logic to the service
-    assignment_model = experiment_service.get_user_assignment(
+    assignment_model = await experiment_service.get_user_assignment(
         experiment_id=experiment_id, user_id=user_id
     )
 
     return assignment_model
 
 
-@app.post(
+@protected.post(
+    "/experiments/{experiment_id}/assignments/batch",
+    response_model=list[AssignmentModel],
+    status_code=status.HTTP_200_OK,
+    summary="Get assignments for a batch of users",
+)
+async def get_user_variant_assignments_batch(
+    experiment_id: str = Path(..., description="The ID of the experiment."),
+    user_ids: list[str] = Body(..., min_length=1, max_length=10_000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retrieves the variant assignments of many users, creating persistent assignments
+    for users that have none; the response lists them in request order.
+    """
+    experiment_service = ExperimentService(db)
+    return await experiment_service.get_user_assignments_bulk(experiment_id, user_ids)
+
+
+@protected.post(
     "/events",
     response_model=EventResponseModel,  # Defines the expected structure of the successful response
     status_code=status.HTTP_201_CREATED,
     summary="Record a new user event.",
+    dependencies=[Depends(events_limiter)],
 )
-def post_events(event_data: EventCreateModel, db: Session = Depends(get_db)):
+async def post_events(
+    event_data: EventCreateModel, db: AsyncSession = Depends(get_events_db)
+):
     try:
         # 3. Business Logic: Pass the request data to the Service Layer
         # The Service is instantiated here, injecting the database session
         event_service = EventService(db)
 
         # The service handles context lookup (assignment) and calls the repository
-        event_response_model = event_service.record_event(event_data)
+        event_response_model = await event_service.record_event(event_data)
 
         # 4. Response Serialization: Convert the ORM object back into the Pydantic response model
         return event_response_model
 
-    except Exception as e:
-        # 5. Error Handling: Catch exceptions (e.g., database errors) and return a 500
-        # In a real app, you'd log the full exception details.
-        print(e)
+    except HTTPException:
+        # already mapped to a client-facing status by the service layer
+        raise
+
+    except Exception:
+        # 5. Error Handling: log the full exception server-side, keyed by a correlation
+        # id the client receives; exception text never goes into the response body.
+        correlation_id = uuid.uuid4().hex
+        logger.exception("event_failed correlation_id=%s", correlation_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred while recording the event: {str(e)}",
+            detail="internal_error",
+            headers={"X-Correlation-ID": correlation_id},
         )
 
 
-@app.get(
+@protected.post(
+    "/events/batch",
+    response_model=list[EventResponseModel],
+    status_code=status.HTTP_201_CREATED,
+    summary="Record a batch of user events.",
+    dependencies=[Depends(events_limiter)],
+)
+async def post_events_batch(
+    events: list[EventCreateModel] = Body(..., min_length=1, max_length=10_000),
+    db: AsyncSession = Depends(get_events_db),
+):
+    """
+    Records many events with one transaction; the response lists the created
+    events in request order. The whole batch is rejected if any event is invalid.
+    """
+    event_service = EventService(db)
+    return await event_service.record_events(events)
+
+
+@protected.get(
     "/experiments/{experiment_id}/results",
     status_code=status.HTTP_200_OK,
     summary="Get statistics for experiments",
 )
-def get_experiment_results(
+async def get_experiment_results(
     experiment_id: str,
     event_type: str | None = Query(
         None,
@@ -110,7 +198,7 @@ def get_experiment_results(
     end_date: datetime | None = Query(
         None,
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     filter_params = {
         "event_type": event_type,
@@ -118,14 +206,31 @@ def get_experiment_results(
         "end_date": end_date,
     }
     experiment_service = ExperimentService(db)
-    experiment_results = experiment_service.get_experiment_results(
+    experiment_results = await experiment_service.get_experiment_results(
         experiment_id, filter_params
     )
     return experiment_results
 
 
+app.include_router(protected)
+
+
 # Optional: Entry point for running the application directly (useful for local development)
 if __name__ == "__main__":
-    # The host and port are the default settings, often used for local development
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
-    # The format "main:app" means: look in the 'main.py' file and find the 'app' object
+    # uvloop/httptools are the C-accelerated event loop and HTTP parser; several
+    # worker processes are needed to use more than one core. Set RELOAD=true for
+    # local development (reload only works with a single worker).
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    uvicorn.run(
+        # workers and reload both require the app as an import string
+        "app.main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=1 if reload else int(os.getenv("WORKERS", os.cpu_count() or 1)),
+        reload=reload,
+        limit_concurrency=1024,
+        backlog=2048,
+        access_log=False,
+    )
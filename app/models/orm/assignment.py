@@ -7,40 +7,46 @@ from sqlalchemy import (
     DateTime,
     Text,
     Enum,
+    Index,
     PrimaryKeyConstraint,
 )
 from sqlalchemy.orm import relationship
-from datetime import datetime
 import enum
 
-from .base import Base
-
-from sqlalchemy.types import TypeEngine
-
-try:
-    from sqlalchemy.dialects.postgresql import JSONB as JSON_TYPE
-except ImportError:
-    try:
-        from sqlalchemy.types import JSON as JSON_TYPE
-    except ImportError:
-        JSON_TYPE = Text
+from .base import Base, utcnow
 
 
 class AssignmentORM(Base):
     __tablename__ = "assignments"
 
-    user_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
     experiment_id = Column(
-        String, ForeignKey("experiments.experiment_id"), nullable=False, index=True
+        String, ForeignKey("experiments.experiment_id"), nullable=False
     )
     variant_id = Column(String, ForeignKey("variants.variant_id"), nullable=False)
 
-    assignment_timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    assignment_timestamp = Column(DateTime, server_default=utcnow(), nullable=False)
 
+    # The (user_id, experiment_id) primary key enforces one assignment per user and
+    # experiment (and is the ON CONFLICT arbiter for inserts). The composites lead with
+    # experiment_id for per-experiment scans and per-variant aggregation for results;
+    # ix_assignments_exp_user carries the variant and timestamp so the events join in
+    # results reads assignments with index-only scans. It is not unique, since the
+    # primary key already guarantees that.
     __table_args__ = (
         PrimaryKeyConstraint("user_id", "experiment_id", name="assignment_pk"),
+        Index(
+            "ix_assignments_exp_user",
+            "experiment_id",
+            "user_id",
+            postgresql_include=["variant_id", "assignment_timestamp"],
+        ),
+        Index("ix_assignments_exp_variant", "experiment_id", "variant_id"),
     )
 
-    variant = relationship("VariantORM")
+    variant = relationship("VariantORM", lazy="raise")
+
+    experiment = relationship("ExperimentORM", lazy="raise")
 
-    experiment = relationship("ExperimentORM")
+    # fetch server-generated defaults with RETURNING on INSERT instead of expiring them
+    __mapper_args__ = {"eager_defaults": True}
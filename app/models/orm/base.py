@@ -1,30 +1,97 @@
+import operator
+
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
+
+try:
+    # Use JSONB for PostgreSQL if available (recommended)
+    from sqlalchemy.dialects.postgresql import JSONB as JSON_TYPE
+except ImportError:
+    try:
+        # Fallback to standard JSON type
+        from sqlalchemy.types import JSON as JSON_TYPE
+    except ImportError:
+        # Final fallback to Text (requires application-level JSON serialization/deserialization)
+        from sqlalchemy.types import Text as JSON_TYPE
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time evaluated by the database, for server-side column defaults.
+
+    Columns are naive DateTime holding UTC, so Postgres' now() is converted to UTC
+    explicitly rather than depending on the session's TimeZone setting.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
 
 
 class CustomBase:
+    @classmethod
+    def _columns(cls) -> tuple[str, ...]:
+        """Column names of the mapped table, computed once per class."""
+        # look in the class' own __dict__ so subclasses never reuse a parent's cache
+        names = cls.__dict__.get("_col_cache")
+        if names is None:
+            names = tuple(c.name for c in cls.__table__.columns)
+            getter = operator.attrgetter(*names)
+            cls._col_cache = names
+            # attrgetter returns a bare value (not a tuple) for a single name;
+            # staticmethod keeps the getter from binding to the instance
+            cls._col_getter = staticmethod(
+                getter if len(names) > 1 else (lambda obj: (getter(obj),))
+            )
+        return names
+
+    @classmethod
+    def _relationships(cls) -> tuple[tuple[str, bool], ...]:
+        """(name, uselist) pairs for the mapped relationships, computed once per class."""
+        relationships = cls.__dict__.get("_relationship_cache")
+        if relationships is None:
+            relationships = tuple(
+                (name, relation.uselist)
+                for name, relation in cls.__mapper__.relationships.items()
+            )
+            cls._relationship_cache = relationships
+        return relationships
+
     def __repr__(self) -> str:
         class_name = self.__class__.__name__
 
-        columns = [(c.name, getattr(self, c.name)) for c in self.__table__.columns]
+        names = self._columns()
+        values = self._col_getter(self)
 
-        column_str = ", ".join(f"{name}={repr(value)}" for name, value in columns)
+        column_str = ", ".join(
+            f"{name}={repr(value)}" for name, value in zip(names, values)
+        )
 
         return f"{class_name}({column_str})"
 
     def to_dict(self, include_relationships=False):
         """Converts the ORM object to a dictionary."""
-        data = {}
-
-        for column in self.__table__.columns:
-            data[column.name] = getattr(self, column.name)
+        names = self._columns()
+        data = dict(zip(names, self._col_getter(self)))
 
         if include_relationships:
-            for name, relation in self.__mapper__.relationships.items():
+            for name, uselist in self._relationships():
                 related_object = getattr(self, name)
 
                 if related_object is None:
                     data[name] = None
-                elif relation.uselist:  # It's a list (e.g., variants = [...])
+                elif uselist:  # It's a list (e.g., variants = [...])
                     data[name] = [
                         item.to_dict(include_relationships=False)
                         for item in related_object
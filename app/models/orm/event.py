@@ -7,44 +7,81 @@ from sqlalchemy import (
     DateTime,
     Text,
     Enum,
+    Identity,
+    Index,
+    Integer,
+    SmallInteger,
+    Uuid,
     PrimaryKeyConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
-from datetime import datetime
 import enum
 
 
-from .base import Base
+from .base import JSON_TYPE, Base, utcnow
 
-from sqlalchemy.types import TypeEngine
 
-try:
-    # Use JSONB for PostgreSQL if available (recommended)
-    from sqlalchemy.dialects.postgresql import JSONB as JSON_TYPE
-except ImportError:
-    try:
-        # Fallback to standard JSON type
-        from sqlalchemy.types import JSON as JSON_TYPE
-    except ImportError:
-        # Final fallback to Text (requires application-level JSON serialization/deserialization)
-        JSON_TYPE = Text
+class EventTypeORM(Base):
+    """Lookup table of event type names; events reference it by a 2-byte id."""
+
+    __tablename__ = "event_types"
+
+    # SQLite only autoincrements an INTEGER PRIMARY KEY (a rowid alias), so the
+    # 2-byte type is Postgres-only
+    event_type_id = Column(
+        SmallInteger().with_variant(Integer, "sqlite"), Identity(), primary_key=True
+    )
+    name = Column(String, nullable=False, unique=True)
 
 
 class EventORM(Base):
     __tablename__ = "events"
 
-    event_id = Column(String, primary_key=True, index=True)
+    # UUIDv7 generated by the application (see app.core.ids), stored as native uuid;
+    # the server default only covers rows inserted outside the app (backfills, ETL)
+    event_id = Column(
+        Uuid(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()"),
+    )
 
     user_id = Column(String, nullable=False, index=True)
 
-    type = Column(String, nullable=False, index=True)
+    # small-int reference instead of the type name so the type indexes and GROUP BY
+    # work on 2-byte keys; EventRepository maps names to ids at the boundary
+    type_id = Column(
+        SmallInteger,
+        ForeignKey("event_types.event_type_id"),
+        nullable=False,
+        index=True,
+    )
 
     experiment_id = Column(
-        String, ForeignKey("experiments.experiment_id"), index=True, nullable=True
+        String, ForeignKey("experiments.experiment_id"), nullable=True
     )
 
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    timestamp = Column(DateTime, server_default=utcnow(), nullable=False, index=True)
 
     properties = Column(JSON_TYPE, default={}, nullable=False)
 
-    experiment = relationship("ExperimentORM", back_populates="events")
+    # Results queries filter on experiment, event type and time range together, and
+    # aggregate per user (distinct users per type, post-assignment timestamps, the
+    # "converted before" probe of the live results query) index-only; the composite
+    # also serves experiment_id-only lookups (leading column).
+    __table_args__ = (
+        Index(
+            "ix_events_exp_type_user_ts",
+            "experiment_id",
+            "type_id",
+            "user_id",
+            "timestamp",
+        ),
+        # containment / key-existence filters on properties (@>, ?, ?|, ?&)
+        Index("ix_events_properties_gin", "properties", postgresql_using="gin"),
+    )
+
+    experiment = relationship("ExperimentORM", back_populates="events", lazy="raise")
+
+    # fetch server-generated defaults with RETURNING on INSERT instead of expiring them
+    __mapper_args__ = {"eager_defaults": True}
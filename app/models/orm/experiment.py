@@ -10,23 +10,9 @@ from sqlalchemy import (
     PrimaryKeyConstraint,
 )
 from sqlalchemy.orm import relationship
-from datetime import datetime
 import enum
 
-from .base import Base
-
-from sqlalchemy.types import TypeEngine
-
-try:
-
-    from sqlalchemy.dialects.postgresql import JSONB as JSON_TYPE
-except ImportError:
-    try:
-        # Fallback to standard JSON type
-        from sqlalchemy.types import JSON as JSON_TYPE
-    except ImportError:
-        # Final fallback to Text (requires application-level JSON serialization/deserialization)
-        JSON_TYPE = Text
+from .base import JSON_TYPE, Base, utcnow
 
 
 # Use Python Enum for constrained choices like Experiment Status
@@ -49,9 +35,9 @@ class ExperimentORM(Base):
         Enum(ExperimentStatus), default=ExperimentStatus.DRAFT, nullable=False
     )
 
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, server_default=utcnow())
     end_time = Column(DateTime, nullable=True)
 
     primary_metric_name = Column(String, nullable=False)
@@ -59,9 +45,15 @@ class ExperimentORM(Base):
     target_duration_days = Column(Float, default=7.0)
     target_statistical_significance = Column(Float, default=0.95)  # 95% confidence
 
-    variants = relationship("VariantORM", back_populates="experiment")
+    # lazy="raise": relationships must be eager-loaded at the query site (selectinload /
+    # joinedload); an accidental lazy load fails fast instead of issuing N+1 SELECTs.
+    variants = relationship("VariantORM", back_populates="experiment", lazy="raise")
+
+    events = relationship("EventORM", back_populates="experiment", lazy="raise")
 
-    events = relationship("EventORM", back_populates="experiment")
+    # fetch server-generated defaults with RETURNING on INSERT/UPDATE instead of
+    # expiring them (an expired attribute cannot be lazily reloaded under asyncio)
+    __mapper_args__ = {"eager_defaults": True}
 
 
 # --- Variant Configuration Model ---
@@ -80,4 +72,4 @@ class VariantORM(Base):
     )
 
     # Relationship to Parent
-    experiment = relationship("ExperimentORM", back_populates="variants")
+    experiment = relationship("ExperimentORM", back_populates="variants", lazy="raise")
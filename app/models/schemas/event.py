@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Dict, Optional
 from datetime import datetime
 
@@ -23,3 +23,5 @@ class EventCreateModel(BaseModel):
 class EventResponseModel(BaseModel):
     event_id: str
     experiment_id: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
@@ -66,6 +66,8 @@ class ExperimentVariantConfigResponseModel(BaseModel):
         description="Percentage of traffic allocated to this variant.",
     )
 
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
 
 class ExperimentResponseModel(BaseModel):
     experiment_id: str = Field(..., description="Unique ID for the experiment.")
@@ -79,7 +81,7 @@ class ExperimentResponseModel(BaseModel):
     variants: List[ExperimentVariantConfigResponseModel]
     primary_metric_name: str = Field(..., description="Primary metric name")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 # --- User Assignment ---
@@ -94,7 +96,7 @@ class AssignmentModel(BaseModel):
         ..., description="The name of the variant the user was assigned."
     )
     assignment_timestamp: datetime = Field(default_factory=datetime.utcnow)
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 # --- Event Tracking ---
@@ -1,62 +1,175 @@
 # repositories/assignment_repo.py
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import Row, String, column, func, select, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+from app.core.settings import config_settings
 from app.models.orm.assignment import AssignmentORM  # Your previously defined ORM model
 from typing import Optional
-import uuid
-from datetime import datetime
+
+# Columns returned by the Core (non-ORM) assignment reads and inserts
+_ASSIGNMENT_COLUMNS = (
+    AssignmentORM.experiment_id,
+    AssignmentORM.user_id,
+    AssignmentORM.variant_id,
+    AssignmentORM.assignment_timestamp,
+)
 
 
 class AssignmentRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_assignment(
+    async def get_assignment(
         self, experiment_id: str, user_id: str
     ) -> Optional[AssignmentORM]:
         """Retrieves a persistent assignment for a user in a specific experiment."""
-        return (
-            self.db.query(AssignmentORM)
-            .filter(
-                AssignmentORM.experiment_id == experiment_id,
-                AssignmentORM.user_id == user_id,
-            )
-            .one_or_none()
+        # primary key lookup: answered from the session's identity map when already loaded
+        return await self.db.get(
+            AssignmentORM,
+            {"user_id": user_id, "experiment_id": experiment_id},
+            options=[raiseload("*")] if config_settings.STRICT_ORM_LOADING else None,
         )
 
-    def get_assignments_for_experiment(self, experiment_id: str) -> list[AssignmentORM]:
-        """Retrieves a persistent assignment for a user in a specific experiment."""
-        stmt = select(AssignmentORM).where(AssignmentORM.experiment_id == experiment_id)
+    async def count_assignments_by_variant(self, experiment_id: str) -> dict[str, int]:
+        """Counts the users assigned to each variant of an experiment, keyed by variant_id."""
+        stmt = (
+            select(AssignmentORM.variant_id, func.count())
+            .where(AssignmentORM.experiment_id == experiment_id)
+            .group_by(AssignmentORM.variant_id)
+        )
 
-        return self.db.scalars(stmt).all()
+        return dict((await self.db.execute(stmt)).all())
 
-    def create_assignment(
+    async def get_or_create_assignment(
         self, experiment_id: str, user_id: str, variant_id: str
-    ) -> AssignmentORM:
+    ) -> Row | AssignmentORM:
         """
-        Creates a new assignment record.
-        Note: The ExperimentService must ensure this isn't a duplicate.
+        Returns the user's stored assignment, creating it with variant_id if there is none.
+
+        The insert is an INSERT ... ON CONFLICT (experiment_id, user_id) DO NOTHING, so
+        concurrent first requests for the same user cannot race each other into an
+        IntegrityError. On Postgres its RETURNING row is also unioned with the already
+        stored row, making it one round-trip for both new and returning users; on
+        SQLite, which cannot put an INSERT in a CTE, a conflict is followed by a read.
+        A stored assignment always wins over variant_id, so users keep the variant
+        they were first given.
         """
-        try:
-            db_assignment = AssignmentORM(
-                experiment_id=experiment_id,
-                user_id=user_id,
-                variant_id=variant_id,
-                assignment_timestamp=datetime.utcnow(),
+        is_postgresql = self._is_postgresql()
+        stmt = self._insert_missing_stmt(
+            [
+                {
+                    "experiment_id": experiment_id,
+                    "user_id": user_id,
+                    "variant_id": variant_id,
+                }
+            ]
+        )
+        if is_postgresql:
+            inserted = stmt.cte("inserted")
+            stmt = (
+                select(inserted)
+                .union_all(
+                    select(*_ASSIGNMENT_COLUMNS).where(
+                        AssignmentORM.experiment_id == experiment_id,
+                        AssignmentORM.user_id == user_id,
+                    )
+                )
+                .limit(1)
             )
 
-            self.db.add(db_assignment)
-            self.db.commit()
-            self.db.refresh(db_assignment)
+        assignment = (await self.db.execute(stmt)).first()
+        await self.db.commit()
+        if assignment is None:
+            # already assigned (SQLite), or on Postgres a concurrent request inserted
+            # the row after this statement's snapshot
+            assignment = await self.get_assignment(experiment_id, user_id)
+
+        return assignment
 
-            return db_assignment
+    async def get_assignments_bulk(
+        self, experiment_id: str, user_ids: list[str]
+    ) -> list[Row]:
+        """
+        Retrieves the stored assignments of many users in one experiment with one query.
 
-        except IntegrityError:
-            # Should not happen if the service checks first, but good for safety
-            self.db.rollback()
-            raise ValueError("Assignment already exists for this user and experiment.")
-        except Exception as e:
-            self.db.rollback()
-            print(f"Exception occurred creating assignment: {e}")
-            raise RuntimeError("Exception occurred during assignment creation")
+        On Postgres the user ids are joined as a VALUES list, which plans better than a
+        long IN (...) list; other databases use IN. Users without an assignment are
+        simply absent from the result.
+        """
+        if not user_ids:
+            return []
+
+        stmt = select(*_ASSIGNMENT_COLUMNS).where(
+            AssignmentORM.experiment_id == experiment_id
+        )
+        if self._is_postgresql():
+            requested = values(column("user_id", String), name="requested").data(
+                [(user_id,) for user_id in user_ids]
+            )
+            stmt = stmt.join(requested, requested.c.user_id == AssignmentORM.user_id)
+        else:
+            stmt = stmt.where(AssignmentORM.user_id.in_(user_ids))
+
+        return (await self.db.execute(stmt)).all()
+
+    async def get_or_create_assignments_bulk(
+        self, experiment_id: str, variant_ids_by_user: dict[str, str]
+    ) -> list[Row]:
+        """
+        Bulk version of get_or_create_assignment: returns one assignment per user,
+        creating the missing ones with the given variant_id.
+
+        Costs a read, one multi-row INSERT ... ON CONFLICT DO NOTHING for the users
+        without an assignment, and a second read only for users a concurrent request
+        assigned in between, instead of a round-trip or two per user.
+        """
+        assignments = await self.get_assignments_bulk(
+            experiment_id, list(variant_ids_by_user)
+        )
+
+        assigned = {assignment.user_id for assignment in assignments}
+        missing = [
+            {
+                "experiment_id": experiment_id,
+                "user_id": user_id,
+                "variant_id": variant_id,
+            }
+            for user_id, variant_id in variant_ids_by_user.items()
+            if user_id not in assigned
+        ]
+        if missing:
+            inserted = (await self.db.execute(self._insert_missing_stmt(missing))).all()
+            await self.db.commit()
+            assignments.extend(inserted)
+
+            if len(inserted) < len(missing):
+                assigned.update(assignment.user_id for assignment in inserted)
+                assignments.extend(
+                    await self.get_assignments_bulk(
+                        experiment_id,
+                        [
+                            row["user_id"]
+                            for row in missing
+                            if row["user_id"] not in assigned
+                        ],
+                    )
+                )
+
+        return assignments
+
+    def _is_postgresql(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def _insert_missing_stmt(self, rows: list[dict]):
+        """INSERT of assignment rows that skips users already assigned, returning the new rows."""
+        insert = pg_insert if self._is_postgresql() else sqlite_insert
+        return (
+            insert(AssignmentORM)
+            .values(rows)
+            # inferred as assignment_pk: the arbiter matches on the column set, not order
+            .on_conflict_do_nothing(index_elements=["experiment_id", "user_id"])
+            .returning(*_ASSIGNMENT_COLUMNS)
+        )
@@ -1,32 +1,100 @@
+import logging
 import uuid
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
 
+import asyncpg
+import orjson
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    BigInteger,
+    Row,
+    Select,
+    and_,
+    cast,
+    column,
+    distinct,
+    exists,
+    func,
+    insert,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
 
+from app.core.ids import uuid7
+from app.core.settings import config_settings
+from app.models.orm.assignment import AssignmentORM
 from app.models.orm.event import (
     EventORM,
+    EventTypeORM,
 )  # Import the ORM model from the file we created
 from app.models.schemas.event import EventCreateModel
 
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement; keeps bind parameters (rows * columns) well under
+# Postgres' 32767 limit.
+EVENT_INSERT_CHUNK_SIZE = 1000
+
+# Above this many rows (on asyncpg) events are streamed with COPY instead, which
+# skips per-row parameter binding and statement parsing entirely.
+EVENT_COPY_THRESHOLD = 500
+
+_EVENT_LIST_ADAPTER = TypeAdapter(list[EventCreateModel])
+
+# Event type name -> event_type_id. Rows in event_types are never updated or
+# deleted, so ids are cached for the lifetime of the process once committed.
+_event_type_ids: dict[str, int] = {}
+
+
+# Daily per-variant aggregates maintained by Postgres (migration f3b9a6c2d814). Declared
+# as a lightweight table clause rather than on Base.metadata so create_all and
+# autogenerate never treat the materialized view as a table.
+mv_experiment_variant_daily = table(
+    "mv_experiment_variant_daily",
+    column("experiment_id"),
+    column("variant_id"),
+    column("day"),
+    column("type_id"),
+    column("event_count"),
+    column("new_users"),
+    column("revenue"),
+    column("refreshed_through"),
+)
+
+
+class VariantAggregate(NamedTuple):
+    """One (variant, event type) row of experiment results."""
+
+    variant_id: str
+    type: str
+    event_count: int
+    conversion_users: int
+    revenue: float
+
 
 class EventRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """Initializes the repository with a database session."""
         self.db = db
 
-    def get_events_for_experiment(self, experiment_id: str, **kwargs) -> list[EventORM]:
-        """
-        Retrieves events for a specific experiment, applying optional filters
-        for event type and time range.
-        """
-        stmt = select(EventORM).where(EventORM.experiment_id == experiment_id)
-
+    @staticmethod
+    def _apply_event_filters(stmt: Select, **kwargs) -> Select:
+        """Applies the optional event type and time range filters to an events query."""
         if event_type := kwargs.get("event_type"):
-            stmt = stmt.where(EventORM.type == event_type)
+            stmt = stmt.where(
+                EventORM.type_id
+                == select(EventTypeORM.event_type_id)
+                .where(EventTypeORM.name == event_type)
+                .scalar_subquery()
+            )
 
         if start_date := kwargs.get("start_date"):
             stmt = stmt.where(EventORM.timestamp >= start_date)
@@ -34,72 +102,413 @@ class EventRepository:
         if end_date := kwargs.get("end_date"):
             stmt = stmt.where(EventORM.timestamp <= end_date)
 
-        return self.db.scalars(stmt).all()
+        return stmt
 
-    def create_event(self, event_data: EventCreateModel) -> EventORM:
+    async def get_variant_aggregates(
+        self,
+        experiment_id: str,
+        primary_metric_name: str,
+        since: Optional[datetime] = None,
+        **kwargs,
+    ) -> list[Row]:
+        """
+        Aggregates an experiment's events per (variant, event type) in the database.
+
+        Only events recorded at or after the user's assignment are counted; events
+        from users without an assignment are excluded by the join. Accepts the
+        optional event_type, start_date and end_date filters.
+
+        With `since`, only events from then on are aggregated and conversion_users
+        skips users who already converted before it, so the rows can be added to
+        aggregates covering the time before `since`.
+
+        Returns:
+            Rows of (variant_id, type, event_count, conversion_users, revenue), where
+            conversion_users is the number of distinct users in the primary metric's row
+            (0 in every other row) and revenue is the sum of the numeric "price" property
+            of purchase events.
+        """
+        is_primary = EventTypeORM.name == primary_metric_name
+        is_purchase = EventTypeORM.name == "purchase"
+        is_converter = is_primary
+        if since is not None:
+            earlier = aliased(EventORM)
+            is_converter = and_(
+                is_primary,
+                ~exists().where(
+                    earlier.experiment_id == EventORM.experiment_id,
+                    earlier.user_id == EventORM.user_id,
+                    earlier.type_id == EventORM.type_id,
+                    earlier.timestamp >= AssignmentORM.assignment_timestamp,
+                    earlier.timestamp < since,
+                ),
+            )
+
+        # FILTER keeps the DISTINCT sort and the JSON extraction to the rows that need them
+        stmt = (
+            select(
+                AssignmentORM.variant_id,
+                EventTypeORM.name.label("type"),
+                func.count().label("event_count"),
+                func.count(distinct(EventORM.user_id))
+                .filter(is_converter)
+                .label("conversion_users"),
+                func.coalesce(
+                    func.sum(EventORM.properties["price"].as_float()).filter(
+                        is_purchase
+                    ),
+                    0.0,
+                ).label("revenue"),
+            )
+            .select_from(EventORM)
+            .join(
+                AssignmentORM,
+                and_(
+                    AssignmentORM.experiment_id == EventORM.experiment_id,
+                    AssignmentORM.user_id == EventORM.user_id,
+                ),
+            )
+            .join(EventTypeORM, EventTypeORM.event_type_id == EventORM.type_id)
+            .where(
+                EventORM.experiment_id == experiment_id,
+                EventORM.timestamp >= AssignmentORM.assignment_timestamp,
+            )
+            .group_by(AssignmentORM.variant_id, EventTypeORM.name)
+        )
+        if since is not None:
+            stmt = stmt.where(EventORM.timestamp >= since)
+        stmt = self._apply_event_filters(stmt, **kwargs)
+
+        return (await self.db.execute(stmt)).all()
+
+    async def get_variant_aggregates_materialized(
+        self,
+        experiment_id: str,
+        primary_metric_name: str,
+        event_type: Optional[str] = None,
+    ) -> list[VariantAggregate]:
+        """
+        Same results as get_variant_aggregates (without date filters), read mostly from
+        mv_experiment_variant_daily. Postgres only.
+
+        Whole days up to the view's last refresh come from the view; only events
+        timestamped since then are aggregated from the base tables. The split is by
+        event timestamp, not insertion order: an event committed after the refresh
+        with an earlier timestamp is not counted until the next refresh (at most
+        RESULTS_VIEW_REFRESH_SECONDS later).
+        """
+        refreshed_through = await self.db.scalar(
+            select(mv_experiment_variant_daily.c.refreshed_through).limit(1)
+        )
+        live_rows = await self.get_variant_aggregates(
+            experiment_id,
+            primary_metric_name,
+            since=refreshed_through,
+            event_type=event_type,
+        )
+        if refreshed_through is None:
+            # view not populated yet: everything is live
+            return [VariantAggregate._make(row) for row in live_rows]
+
+        mv = mv_experiment_variant_daily
+        is_primary = EventTypeORM.name == primary_metric_name
+        # sum() of bigint is numeric in Postgres; cast back so counts stay ints
+        stmt = (
+            select(
+                mv.c.variant_id,
+                EventTypeORM.name.label("type"),
+                cast(func.sum(mv.c.event_count), BigInteger),
+                cast(
+                    func.coalesce(func.sum(mv.c.new_users).filter(is_primary), 0),
+                    BigInteger,
+                ),
+                func.sum(mv.c.revenue),
+            )
+            .select_from(mv)
+            .join(EventTypeORM, EventTypeORM.event_type_id == mv.c.type_id)
+            .where(mv.c.experiment_id == experiment_id)
+            .group_by(mv.c.variant_id, EventTypeORM.name)
+        )
+        if event_type:
+            stmt = stmt.where(EventTypeORM.name == event_type)
+
+        totals: dict[tuple[str, str], list] = {}
+        for row in (await self.db.execute(stmt)).all() + live_rows:
+            key = (row[0], row[1])
+            if key in totals:
+                for i in range(2, 5):
+                    totals[key][i] += row[i]
+            else:
+                totals[key] = list(row)
+
+        return [VariantAggregate._make(values) for values in totals.values()]
+
+    async def refresh_variant_daily_view(self) -> bool:
+        """
+        Refreshes mv_experiment_variant_daily without blocking its readers.
+
+        Skipped (returns False) when another process already holds the refresh lock,
+        so several workers on one schedule do not refresh back to back.
+        """
+        async with self.db.begin():
+            acquired = await self.db.scalar(
+                text(
+                    "SELECT pg_try_advisory_xact_lock(hashtext('mv_experiment_variant_daily'))"
+                )
+            )
+            if not acquired:
+                return False
+            await self.db.execute(
+                text(
+                    "REFRESH MATERIALIZED VIEW CONCURRENTLY mv_experiment_variant_daily"
+                )
+            )
+        return True
+
+    async def create_event(
+        self, event_data: EventCreateModel, event_id: Optional[uuid.UUID] = None
+    ) -> EventORM:
         """
         Creates a new event record in the database.
 
         Args:
             event_data: The Pydantic model containing event details.
-            experiment_id: The ID of the experiment the user is currently in (set by service).
+            event_id: Pre-generated id for the event; a new UUIDv7 is used if omitted.
 
         Returns:
             The created EventORM object.
         """
 
-        event_dict = event_data.model_dump(exclude_unset=True)
+        # the column set is small and fixed, so read the attributes directly
+        # rather than walking the schema with model_dump()
+        event_dict = {
+            "event_id": event_id or uuid7(),
+            "user_id": event_data.user_id,
+            "experiment_id": event_data.experiment_id,
+            "properties": event_data.properties,
+        }
+        if event_data.timestamp is not None:
+            event_dict["timestamp"] = event_data.timestamp
+
+        try:
+            type_ids = await self._resolve_type_ids({event_data.type})
+            event_dict["type_id"] = type_ids[event_data.type]
+
+            db_event = EventORM(**event_dict)
+            self.db.add(db_event)
+            # the id is known up front, so no refresh round-trip is needed after commit
+            await self.db.commit()
+
+        except HTTPException:
+            await self.db.rollback()
+            raise
+
+        except Exception as e:
+            await self.db.rollback()
+            raise self._to_http_exception(e) from e
+
+        return db_event
+
+    async def create_events_bulk(self, events: list[EventCreateModel]) -> list[dict]:
+        """
+        Creates many event records in one transaction.
+
+        Returns:
+            The inserted rows, including their generated event_ids.
+        """
+        # one schema walk for the whole batch instead of a model_dump() per event
+        rows = _EVENT_LIST_ADAPTER.dump_python(events)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for row in rows:
+            row["event_id"] = uuid7()
+            if row["timestamp"] is None:
+                row["timestamp"] = now
+
+        await self.insert_event_rows(rows)
 
-        if "event_id" not in event_dict:
-            event_dict["event_id"] = str(uuid.uuid4())
+        return rows
 
-        if "timestamp" not in event_dict:
-            event_dict["timestamp"] = datetime.utcnow()
+    @staticmethod
+    def build_event_row(
+        event_data: EventCreateModel, event_id: Optional[uuid.UUID] = None
+    ) -> dict:
+        """Builds a complete row for insert_event_rows from an API event."""
+        return {
+            "event_id": event_id or uuid7(),
+            "user_id": event_data.user_id,
+            "type": event_data.type,
+            "experiment_id": event_data.experiment_id,
+            "timestamp": event_data.timestamp
+            or datetime.now(timezone.utc).replace(tzinfo=None),
+            "properties": event_data.properties,
+        }
 
-        event_dict["event_id"] = str(uuid.uuid4())
+    async def insert_event_rows(self, rows: list[dict]) -> None:
+        """
+        Inserts fully-populated event rows with multi-row INSERTs and one commit.
 
-        db_event = EventORM(**event_dict)
+        Uses a Core insert (no ORM unit-of-work or identity map); every row must carry
+        the same keys, including a pre-generated event_id. Rows carry the event type
+        name under "type", which is mapped to its type_id.
+        """
         try:
-            self.db.add(db_event)
-            self.db.commit()
-            self.db.refresh(
-                db_event
-            )  # Refresh to get auto-generated fields if any (like the final timestamp)
+            type_ids = await self._resolve_type_ids({row["type"] for row in rows})
+            # copies, so callers can retry with the original rows
+            rows = [
+                {key: value for key, value in row.items() if key != "type"}
+                | {"type_id": type_ids[row["type"]]}
+                for row in rows
+            ]
+
+            if (
+                not config_settings.EVENTS_DURABLE
+                and self.db.get_bind().dialect.name == "postgresql"
+            ):
+                # only this transaction: its COMMIT returns before the WAL is flushed
+                await self.db.execute(text("SET LOCAL synchronous_commit = off"))
 
-        except IntegrityError as e:
-            self.db.rollback()
-            print(f"Database Integrity Error during event creation: {e}")
+            if (
+                len(rows) > EVENT_COPY_THRESHOLD
+                and self.db.get_bind().dialect.driver == "asyncpg"
+            ):
+                await self._copy_event_rows(rows)
+            else:
+                for start in range(0, len(rows), EVENT_INSERT_CHUNK_SIZE):
+                    await self.db.execute(
+                        insert(EventORM), rows[start : start + EVENT_INSERT_CHUNK_SIZE]
+                    )
+            await self.db.commit()
+
+        except HTTPException:
+            await self.db.rollback()
+            raise
+
+        except Exception as e:
+            await self.db.rollback()
+            raise self._to_http_exception(e) from e
+
+    async def _copy_event_rows(self, rows: list[dict]) -> None:
+        """
+        Streams event rows into the events table with a binary COPY (asyncpg only).
 
-            raise HTTPException(
+        Runs inside a SAVEPOINT so a failed COPY leaves the session's transaction
+        usable. Rows must already carry type_id rather than the type name.
+        """
+        columns = [column.name for column in EventORM.__table__.columns]
+        # binary COPY bypasses SQLAlchemy's type processing, so JSONB goes as text
+        records = [
+            tuple(
+                orjson.dumps(row[name]).decode() if name == "properties" else row[name]
+                for name in columns
+            )
+            for row in rows
+        ]
+
+        async with self.db.begin_nested():
+            connection = await self.db.connection()
+            raw_connection = await connection.get_raw_connection()
+            try:
+                await raw_connection.driver_connection.copy_records_to_table(
+                    EventORM.__tablename__, records=records, columns=columns
+                )
+            except asyncpg.IntegrityConstraintViolationError as e:
+                # surface as the SQLAlchemy error the callers already map to a 400
+                raise IntegrityError("COPY events", None, e) from e
+
+    async def _resolve_type_ids(self, names: set[str]) -> dict[str, int]:
+        """
+        Maps event type names to their event_type_id, creating unseen types.
+
+        New types are committed on their own before the events referencing them, so
+        the process-wide cache never holds an id whose insert was rolled back. Once
+        EVENT_TYPES_MAX types exist, new names are rejected with a 422.
+        """
+        missing = names - _event_type_ids.keys()
+        if missing:
+            stmt = select(EventTypeORM.name, EventTypeORM.event_type_id).where(
+                EventTypeORM.name.in_(missing)
+            )
+            found = dict((await self.db.execute(stmt)).all())
+
+            new_names = missing - found.keys()
+            if new_names:
+                type_count = await self.db.scalar(
+                    select(func.count()).select_from(EventTypeORM)
+                )
+                if type_count + len(new_names) > config_settings.EVENT_TYPES_MAX:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                        detail="Unknown event type: the event type limit has been reached.",
+                    )
+
+                insert_stmt = (
+                    pg_insert
+                    if self.db.get_bind().dialect.name == "postgresql"
+                    else sqlite_insert
+                )
+                # names created concurrently by another request are skipped, not
+                # raised; any other integrity error still propagates
+                await self.db.execute(
+                    insert_stmt(EventTypeORM)
+                    .values([{"name": name} for name in new_names])
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+                await self.db.commit()
+
+                found = dict((await self.db.execute(stmt)).all())
+                if len(found) < len(missing):
+                    logger.error(
+                        "event types missing after insert: %s",
+                        sorted(missing - found.keys()),
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Event type could not be registered. Please try again shortly.",
+                    )
+
+            _event_type_ids.update(found)
+
+        return {name: _event_type_ids[name] for name in names}
+
+    @staticmethod
+    def _to_http_exception(e: Exception) -> HTTPException:
+        """Maps a failed event write to the HTTP error returned to the client."""
+        if isinstance(e, IntegrityError):
+            # a client error (bad foreign key, missing field): no traceback needed. The
+            # database text (constraint names, values) is only logged, keyed by a
+            # correlation id the client receives.
+            correlation_id = uuid.uuid4().hex
+            logger.warning(
+                "event insert rejected correlation_id=%s: %s",
+                correlation_id,
+                str(e).splitlines()[0],
+            )
+
+            return HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid event data: A required field is missing or a foreign key reference is invalid. Details: {str(e).splitlines()[0]}",
+                detail="Invalid event data: A required field is missing or a foreign key reference is invalid.",
+                headers={"X-Correlation-ID": correlation_id},
             )
 
-        except OperationalError as e:
-            self.db.rollback()
-            print(f"Database Operational Error: {e}")
+        if isinstance(e, OperationalError):
+            logger.exception("event insert failed: database unavailable", exc_info=e)
 
-            raise HTTPException(
+            return HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Database connection failed. Please try again shortly.",
             )
 
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            print(f"Unexpected SQLAlchemy Error: {e}")
+        if isinstance(e, SQLAlchemyError):
+            logger.exception("event insert failed: database error", exc_info=e)
 
-            raise HTTPException(
+            return HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"An unexpected database error occurred.",
             )
 
-        except Exception as e:
-            self.db.rollback()
-            print(f"General Error during event creation: {e}")
+        logger.exception("event insert failed", exc_info=e)
 
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="An unexpected server error occurred during event creation.",
-            )
-
-        return db_event
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected server error occurred during event creation.",
+        )
@@ -1,108 +1,114 @@
-import uuid
-import json
-from typing import Optional
-
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
-from app.models.orm.event import (
-    EventORM,
-)  # Import the ORM model from the file we created
-from app.models.orm.experiment import ExperimentORM, VariantORM, ExperimentStatus
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.ids import uuid7
+from app.core.settings import config_settings
+from app.models.orm.experiment import ExperimentORM, VariantORM
 from app.models.schemas.experiment import ExperimentCreateModel
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select
+from sqlalchemy.orm import raiseload, selectinload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+logger = logging.getLogger(__name__)
+
 
 class ExperimentRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """Initializes the repository with a database session."""
         self.db = db
 
-    def create_experiment(
+    async def create_experiment(
         self, experiment_data: ExperimentCreateModel
     ) -> ExperimentORM:
         """
-        Creates a new event record in the database.
+        Creates a new experiment and its variants in the database.
 
         Args:
-            event_data: The Pydantic model containing event details.
-            experiment_id: The ID of the experiment the user is currently in (set by service).
+            experiment_data: The Pydantic model containing the experiment details and its
+                variant configs, whose traffic allocations must sum to 100%.
 
         Returns:
-            The created EventORM object.
-
+            The created ExperimentORM object, with its variants.
 
-        Experiments will have variantconfigs attached to them, variant configs can be parsed and then a variant can be created
-        alongside the experiment
+        Raises:
+            ValueError: If the traffic allocations do not sum to 100%, or the name is
+                already taken.
+            RuntimeError: On any other database error.
         """
 
-        total_allocation = sum(
-            v.traffic_allocation_percent for v in experiment_data.variants
-        )
-        if total_allocation != 100.0:
+        # compare in integer basis points: float percentages such as 33.33 + 33.33
+        # + 33.34 do not sum to exactly 100.0
+        total_allocation_bps = 0
+        for variant_data in experiment_data.variants:
+            total_allocation_bps += round(variant_data.traffic_allocation_percent * 100)
+
+        if total_allocation_bps != 10_000:
 
             raise ValueError(
-                f"Total traffic allocation must be 100%. Got: {total_allocation}%"
+                f"Total traffic allocation must be 100%. Got: {total_allocation_bps / 100}%"
             )
 
-        try:
-
-            with self.db.begin():
-
-                experiment_id = str(uuid.uuid4())
+        # ids and ORM objects are built before the transaction opens, so it only
+        # spans the INSERTs
+        experiment_id = str(uuid7())
 
-                experiment_data_dict = experiment_data.model_dump(
-                    exclude={"variants"}, exclude_unset=True
-                )
+        # one model_dump for the experiment and its nested variants
+        experiment_data_dict = experiment_data.model_dump(exclude_unset=True)
+        variant_dicts = experiment_data_dict.pop("variants")
 
-                experiment_data_dict["experiment_id"] = experiment_id
+        experiment_data_dict["experiment_id"] = experiment_id
 
-                db_experiment = ExperimentORM(**experiment_data_dict)
-                self.db.add(db_experiment)
+        db_experiment = ExperimentORM(**experiment_data_dict)
 
-                for variant_data in experiment_data.variants:
+        variants = []
+        for variant_dict in variant_dicts:
 
-                    variant_dict = variant_data.model_dump(exclude_unset=True)
+            variant_dict["variant_id"] = str(uuid7())
+            variant_dict["experiment_id"] = experiment_id  # ⬅️ Link to the parent
 
-                    variant_dict["variant_id"] = str(uuid.uuid4())
-                    variant_dict["experiment_id"] = (
-                        experiment_id  # ⬅️ Link to the parent
-                    )
+            variants.append(VariantORM(**variant_dict))
 
-                    if variant_dict.get("configuration_json") is not None:
-                        variant_dict["configuration_json"] = json.dumps(
-                            variant_dict["configuration_json"]
-                        )
+        # attached through the relationship so the collection is already
+        # populated after commit and no refresh SELECT is needed; the
+        # variants (client-side PKs, no server defaults) are flushed as a
+        # single executemany INSERT
+        db_experiment.variants = variants
 
-                    db_variant = VariantORM(**variant_dict)
-                    self.db.add(db_variant)
+        try:
 
-            self.db.refresh(db_experiment)
+            async with self.db.begin():
+                self.db.add(db_experiment)
 
             return db_experiment
 
         except IntegrityError as e:
-            raise ValueError(f"Database integrity error (e.g., duplicate name): {e}")
+            # the message reaches the client, so the statement and its parameters
+            # stay in the log and on __cause__
+            logger.warning(
+                "Experiment insert rejected: %s", str(e.orig).splitlines()[0]
+            )
+            raise ValueError("An experiment with this name already exists.") from e
 
         except SQLAlchemyError as e:
             raise RuntimeError(
-                f"A database error occurred during experiment creation: {e}"
-            )
-
-        except Exception:
-            raise
+                "A database error occurred during experiment creation."
+            ) from e
 
-    def get_experiment_with_variants(self, experiment_id: str) -> ExperimentORM | None:
+    async def get_experiment_with_variants(
+        self, experiment_id: str
+    ) -> ExperimentORM | None:
         """
         Fetches a single Experiment by experiment_id and eagerly loads all
-        associated VariantORM objects in a single query.
+        associated VariantORM objects, in two queries regardless of variant count.
         """
-        stmt = select(ExperimentORM).where(ExperimentORM.experiment_id == experiment_id)
-
-        # 2. Use joinedload() to fetch the 'variants' relationship (defined in ExperimentORM). This prevents the N+1 query problem.
-        stmt = stmt.options(joinedload(ExperimentORM.variants))
-
-        result = self.db.scalars(stmt).unique().one_or_none()
+        # 2. Use selectinload() to fetch the 'variants' relationship (defined in ExperimentORM) in one
+        # extra "WHERE experiment_id IN (...)" query. This prevents the N+1 query problem without
+        # repeating the experiment columns on every variant row as a JOIN would. session.get()
+        # returns an experiment already in the identity map without any SQL.
+        options = [selectinload(ExperimentORM.variants)]
+        if config_settings.STRICT_ORM_LOADING:
+            options.append(raiseload("*"))
+
+        result = await self.db.get(ExperimentORM, experiment_id, options=options)
 
         return result
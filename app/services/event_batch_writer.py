@@ -0,0 +1,119 @@
+# services/event_batch_writer.py
+import asyncio
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.db import EventsSessionLocal
+from app.models.schemas.event import EventCreateModel
+from app.repositories.event_repo import EventRepository
+
+_STOP = object()
+
+
+class EventBatchWriter:
+    """
+    Coalesces concurrent POST /events requests into multi-row INSERTs.
+
+    Requests enqueue their row and await a future. A single background task takes
+    whatever has queued up (at most max_batch_size rows), writes it with one INSERT
+    and one commit on its own session, then resolves the futures. Batches form while
+    the previous flush is in flight, so under low load an event is written as soon
+    as it arrives, and under bursts many events share one round-trip and fsync.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_batch_size: int = 500,
+        max_queue_size: int = 10_000,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Starts the background flush task on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Flushes everything already queued, then stops the background task."""
+        if not self.is_running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, event_data: EventCreateModel, event_id: uuid.UUID) -> dict:
+        """Queues an event for insertion and waits until its batch is committed."""
+        row = EventRepository.build_event_row(event_data, event_id=event_id)
+
+        future = asyncio.get_running_loop().create_future()
+        # blocks (backpressure) when max_queue_size rows are already waiting
+        await self._queue.put((row, future))
+        await future
+
+        return row
+
+    async def _flush_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if _STOP in batch:
+                batch.remove(_STOP)
+                stopping = True
+
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            await self._insert([row for row, _ in batch])
+        except HTTPException as e:
+            if len(batch) > 1 and (
+                isinstance(e.__cause__, (IntegrityError, DataError))
+                or e.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+            ):
+                # one bad row (e.g. unknown experiment_id, or a new event type past
+                # the limit) must not fail its neighbours
+                for item in batch:
+                    await self._flush([item])
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except Exception as e:
+            error = HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An unexpected server error occurred during event creation.",
+            )
+            error.__cause__ = e
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    async def _insert(self, rows: list[dict]) -> None:
+        async with self.session_factory() as db:
+            await EventRepository(db).insert_event_rows(rows)
+
+
+event_batch_writer = EventBatchWriter(EventsSessionLocal)
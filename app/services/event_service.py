@@ -1,34 +1,49 @@
 # services/event_service.py
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.ids import uuid7
 from app.repositories.event_repo import EventRepository
 from app.models.schemas.event import EventCreateModel, EventResponseModel
 from app.models.orm.event import EventORM
 from app.repositories.assignment_repo import (
     AssignmentRepository,
 )  # Assuming an Assignment Repository exists
+from app.services.event_batch_writer import event_batch_writer
 
 
 class EventService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """Initializes the service with repositories it needs."""
         self.event_repo = EventRepository(db)
         # We need the AssignmentRepo to look up the user's experiment context
         self.assignment_repo = AssignmentRepository(db)
 
-    def record_event(self, event_data: EventCreateModel) -> EventResponseModel:
+    async def record_event(self, event_data: EventCreateModel) -> EventResponseModel:
         """
         Handles the business logic for recording an event.
         1. Finds the active experiment assignment for the user.
         2. Records the event with the correct experiment context.
         """
         try:
-            recorded_event = self.event_repo.create_event(event_data=event_data)
+            # generated here (time-ordered) so neither write path needs RETURNING
+            event_id = uuid7()
+
+            if event_batch_writer.is_running:
+                # coalesced with concurrent requests into one multi-row INSERT
+                await event_batch_writer.submit(event_data, event_id=event_id)
+            else:
+                await self.event_repo.create_event(
+                    event_data=event_data, event_id=event_id
+                )
 
             return EventResponseModel(
-                event_id=recorded_event.event_id,
-                experiment_id=recorded_event.experiment_id,
+                event_id=str(event_id),
+                experiment_id=event_data.experiment_id,
             )
+        except HTTPException:
+            # already mapped by the repository / batch writer (e.g. 400 on an unknown
+            # experiment_id, 503 when the database is unavailable)
+            raise
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,3 +54,29 @@ class EventService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Encountered error when creating event",
             )
+
+    async def record_events(
+        self, events: list[EventCreateModel]
+    ) -> list[EventResponseModel]:
+        """
+        Records a batch of events with one transaction, in request order.
+        The whole batch is rejected if any event is invalid.
+        """
+        try:
+            rows = await self.event_repo.create_events_bulk(events)
+
+            return [
+                EventResponseModel(
+                    event_id=str(row["event_id"]),
+                    experiment_id=row["experiment_id"],
+                )
+                for row in rows
+            ]
+        except HTTPException:
+            # already mapped by the repository (e.g. 400 on an unknown experiment_id)
+            raise
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Encountered error when creating events",
+            )
@@ -1,35 +1,132 @@
 # services/experiment_service.py
+import asyncio
+import logging
 import mmh3
-import random
-from collections import defaultdict
-from sqlalchemy.dialects.postgresql import psycopg2
-from sqlalchemy.orm import Session
-from datetime import datetime
+from array import array
+from dataclasses import dataclass
+from cachetools import TTLCache
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
 
-from app.models.orm.event import EventORM
 from app.models.schemas.experiment import (
     ExperimentCreateModel,
     ExperimentResponseModel,
     AssignmentModel,
-    ExperimentVariantConfigResponseModel,
 )
 from app.repositories.assignment_repo import AssignmentRepository
 from app.repositories.event_repo import EventRepository
 from app.repositories.experiment_repo import ExperimentRepository
-from app.models.orm.assignment import AssignmentORM
-from app.models.orm.experiment import VariantORM, ExperimentORM
+from app.models.orm.experiment import ExperimentORM, ExperimentStatus
 from fastapi import HTTPException, status
-from typing import Dict, List, Tuple, Optional
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Hash buckets used for assignment; one bucket is one basis point of traffic.
+ASSIGNMENT_BUCKETS = 10_000
+
+
+@dataclass(frozen=True, slots=True)
+class CachedVariant:
+    """Immutable snapshot of a variant's configuration."""
+
+    variant_id: str
+    variant_name: str
+    traffic_allocation_percent: float
+
+
+@dataclass(frozen=True, slots=True)
+class CachedExperiment:
+    """Immutable, session-independent snapshot of an experiment and its variants."""
+
+    experiment_id: str
+    name: str
+    description: Optional[str]
+    status: ExperimentStatus
+    start_time: datetime
+    end_time: Optional[datetime]
+    primary_metric_name: str
+    variants: tuple[CachedVariant, ...]
+    # routing[bucket] is the index into `variants` of the variant owning that
+    # hash bucket, so assignment is a single lookup instead of a cumulative scan
+    routing: array
+
+    @classmethod
+    def from_orm(cls, experiment: ExperimentORM) -> "CachedExperiment":
+        variants = tuple(
+            CachedVariant(
+                variant_id=v.variant_id,
+                variant_name=v.variant_name,
+                traffic_allocation_percent=v.traffic_allocation_percent,
+            )
+            for v in experiment.variants
+        )
+
+        return cls(
+            experiment_id=experiment.experiment_id,
+            name=experiment.name,
+            description=experiment.description,
+            status=experiment.status,
+            start_time=experiment.start_time,
+            end_time=experiment.end_time,
+            primary_metric_name=experiment.primary_metric_name,
+            variants=variants,
+            routing=_build_routing_table(variants),
+        )
+
+
+def _build_routing_table(variants: tuple[CachedVariant, ...]) -> array:
+    """
+    Splits the ASSIGNMENT_BUCKETS hash buckets between variants in proportion to their
+    allocation (in basis points), in variant_name order.
+
+    Returns an empty table when no traffic is allocated.
+    """
+    total_weight = sum(v.traffic_allocation_percent for v in variants)
+    routing = array("H")  # unsigned 16-bit variant indexes, 20 KB per experiment
+    if total_weight == 0:
+        return routing
+
+    order = sorted(range(len(variants)), key=lambda i: variants[i].variant_name)
+
+    cumulative_weight = 0.0
+    for index in order:
+        cumulative_weight += variants[index].traffic_allocation_percent
+        threshold = round(cumulative_weight * ASSIGNMENT_BUCKETS / total_weight)
+        routing.extend([index] * (threshold - len(routing)))
+
+    # rounding can leave the last buckets unassigned; they go to the last variant
+    routing.extend([order[-1]] * (ASSIGNMENT_BUCKETS - len(routing)))
+    return routing
+
+
+# Experiment configuration changes on the order of minutes, so assignment and
+# results requests read it from this per-process cache instead of the database.
+# Any future update/status-change path must pop the experiment_id from it.
+_experiment_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+# experiment_id -> future for the database load currently in flight
+_experiment_loads: dict[str, asyncio.Future] = {}
+
+# Assignments are written once and never change, so a cached (frozen) response
+# can never be stale; only hits are cached, a miss always goes to the database.
+_assignment_cache: TTLCache = TTLCache(maxsize=100_000, ttl=300)
+
+# Dashboards poll results far more often than the numbers meaningfully move, so a
+# computed result is served for up to 30s (new events show up after that). Cached
+# dicts are shared between requests and must be treated as read-only.
+_results_cache: TTLCache = TTLCache(maxsize=512, ttl=30)
 
 
 class ExperimentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.assignment_repo = AssignmentRepository(db)
         self.experiment_repo = ExperimentRepository(db)
         self.event_repo = EventRepository(db)
         self.db = db
 
-    def create_experiment(
+    async def create_experiment(
         self, experiment_data: ExperimentCreateModel
     ) -> ExperimentResponseModel:
         """
@@ -40,287 +137,305 @@ class ExperimentService:
         """
         try:
             # Delegate the transactional database operation to the Repository
-            experiment_orm: ExperimentORM = self.experiment_repo.create_experiment(
-                experiment_data
+            experiment_orm: ExperimentORM = (
+                await self.experiment_repo.create_experiment(experiment_data)
             )
 
+            # variants are already loaded by the repository, so pydantic-core copies the
+            # attributes directly without building intermediate dicts or lazy loading
             experiment_response_model: ExperimentResponseModel = (
-                ExperimentResponseModel(
-                    experiment_id=experiment_orm.experiment_id,
-                    name=experiment_orm.name,
-                    description=experiment_orm.description,
-                    status=experiment_orm.status,
-                    start_time=experiment_orm.start_time,
-                    end_time=experiment_orm.end_time,
-                    variants=[
-                        ExperimentVariantConfigResponseModel(
-                            variant_id=variant.variant_id,
-                            variant_name=variant.variant_name,
-                            traffic_allocation_percent=variant.traffic_allocation_percent,
-                        )
-                        for variant in experiment_orm.variants
-                    ],
-                    primary_metric_name=experiment_orm.primary_metric_name,
-                )
+                ExperimentResponseModel.model_validate(experiment_orm)
             )
+            _experiment_cache.pop(experiment_orm.experiment_id, None)
 
             return experiment_response_model
 
         except ValueError as e:
             # Catch business validation errors raised by the Repository (e.g., 100% traffic check)
-            print(e)
+            logger.info("Rejected experiment %r: %s", experiment_data.name, e)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-        except Exception as e:
-            # Catch other unexpected errors
-            print(e)
+        except RuntimeError:
+            # Database failures, already classified by the Repository; anything else
+            # is a bug and propagates as a plain 500. The database error text is
+            # logged, not returned to the client.
+            logger.exception("Failed to create experiment %r", experiment_data.name)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to create experiment: {str(e)}",
+                detail="Failed to create experiment.",
+            )
+
+    async def _get_experiment_cached(
+        self, experiment_id: str
+    ) -> Optional[CachedExperiment]:
+        """Returns the experiment configuration, loading it from the database on a cache miss."""
+        experiment = _experiment_cache.get(experiment_id)
+        if experiment is not None:
+            return experiment
+
+        # concurrent misses for one experiment (e.g. right after it expires from the
+        # cache) wait for the load already in flight instead of each querying
+        loading = _experiment_loads.get(experiment_id)
+        if loading is not None:
+            await asyncio.wait([loading])
+            if not loading.cancelled():
+                return loading.result()
+            # that request failed or was cancelled; load with this request's session
+
+        loading = asyncio.get_running_loop().create_future()
+        _experiment_loads[experiment_id] = loading
+        try:
+            experiment_orm = await self.experiment_repo.get_experiment_with_variants(
+                experiment_id
             )
+            experiment = (
+                CachedExperiment.from_orm(experiment_orm) if experiment_orm else None
+            )
+            if experiment is not None:
+                _experiment_cache[experiment_id] = experiment
+            loading.set_result(experiment)
+            return experiment
+        finally:
+            # on errors, waiters see a cancelled future and retry on their own
+            if not loading.done():
+                loading.cancel()
+            if _experiment_loads.get(experiment_id) is loading:
+                del _experiment_loads[experiment_id]
 
     # Helper function for traffic allocation (simplified)
-    def _allocate_variant(self, user_id: str, variants: List[VariantORM]) -> VariantORM:
+    def _allocate_variant(
+        self, experiment: CachedExperiment, user_id: str
+    ) -> CachedVariant:
         """
         Selects a variant based on configured traffic allocation percentages.
+
+        The choice is a pure function of (experiment_id, user_id): the pair is hashed
+        into one of ASSIGNMENT_BUCKETS buckets, and the experiment's precomputed
+        routing table maps the bucket to its variant.
         """
-        # Create a list of tuples: (traffic_allocation_percent, VariantORM)
-        choices = [
-            (v.traffic_allocation_percent, v)
-            for v in sorted(variants, key=lambda x: x.variant_name)
-        ]
-
-        # Build the cumulative distribution for weighted random selection
-        total_weight = sum(w for w, v in choices)
-        if total_weight == 0:
+        if not experiment.routing:
             # Should not happen if experiment creation validates to 100%
             raise ValueError("Experiment has no allocated traffic.")
 
-        # use murmurhash to get deterministic unsigned int from roughly uniform dist, normalize to [0, 100) for bucketing
-        hash_unsigned = mmh3.hash(user_id, 0, signed=False)
-        r = ((hash_unsigned / 2**32) * 100)
-
-        cumulative_weight = 0
-        for weight, variant in choices:
-            print(
-                f"Assigning variant:\ncum weight: {cumulative_weight}, weight: {weight}, r: {r}"
-            )
-            cumulative_weight += weight
-            if r <= cumulative_weight:
-                return variant
+        # use murmurhash to get a deterministic, roughly uniform unsigned int; salting with
+        # the experiment_id keeps a user's buckets independent across experiments
+        bucket = (
+            mmh3.hash(f"{experiment.experiment_id}:{user_id}", 0, signed=False)
+            % ASSIGNMENT_BUCKETS
+        )
 
-        # Fallback (should not be reached)
-        return variants[-1][1]
+        return experiment.variants[experiment.routing[bucket]]
 
-    def get_user_assignment(self, experiment_id: str, user_id: str) -> AssignmentModel:
+    async def get_user_assignment(
+        self, experiment_id: str, user_id: str
+    ) -> AssignmentModel:
         """
         Gets a user's variant assignment, ensuring idempotency.
 
-        1. Check for existing assignment (idempotency rule).
-        2. If none, determine assignment based on traffic.
-        3. Persist the new assignment.
+        1. Check the in-process cache for an assignment already served.
+        2. Determine the assignment from the experiment's traffic allocation.
+        3. Persist it, or load the user's existing assignment, in one round-trip.
         """
 
-        # 1. Check for existing assignment (Idempotency)
-        existing_assignment = self.assignment_repo.get_assignment(
-            experiment_id, user_id
-        )
-        if existing_assignment:
-            print(
-                f"User {user_id} already assigned to variant {existing_assignment.variant_id}. Returning existing."
-            )
-            return AssignmentModel.model_validate(existing_assignment)
-
-        # --- If no existing assignment, proceed to allocation ---
+        # 1. Check for existing assignment (Idempotency), in process first
+        cache_key = (experiment_id, user_id)
+        cached_assignment = _assignment_cache.get(cache_key)
+        if cached_assignment is not None:
+            return cached_assignment
 
-        # Fetch the variants and their configurations from the experiment (requires joins/queries)
-        experiment = self.experiment_repo.get_experiment_with_variants(
-            experiment_id
-        )  # Assuming this method exists
+        # Fetch the variants and their configurations from the experiment (cached per process)
+        experiment = await self._get_experiment_cached(experiment_id)
         if not experiment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Experiment {experiment_id} not found.",
             )
 
-        # 2. Determine Assignment
-        assigned_variant = self._allocate_variant(user_id, experiment.variants)
+        # 2. Determine Assignment. Deterministic, but the stored assignment still wins:
+        # rows written before the current bucketing scheme may name another variant
+        assigned_variant = self._allocate_variant(experiment, user_id)
 
-        # 3. Persist the new assignment
-        print(
-            f"Assigning user {user_id} to new variant {assigned_variant.variant_id} for persistence."
-        )
-        new_assignment = self.assignment_repo.create_assignment(
+        # 3. Persist the new assignment, or get the existing one
+        assignment = await self.assignment_repo.get_or_create_assignment(
             experiment_id=experiment_id,
             user_id=user_id,
             variant_id=assigned_variant.variant_id,
         )
 
-        return AssignmentModel.model_validate(new_assignment)
+        assignment_model = AssignmentModel.model_validate(assignment)
+        _assignment_cache[cache_key] = assignment_model
+        return assignment_model
+
+    async def get_user_assignments_bulk(
+        self, experiment_id: str, user_ids: list[str]
+    ) -> list[AssignmentModel]:
+        """
+        Gets (creating where needed) the assignments of many users at once.
 
-    def _generate_user_stats(self):
-        pass
+        Same rules as get_user_assignment, but users missing from the in-process
+        cache are read and created with a fixed number of queries for the whole batch.
+        Returns one assignment per requested user id, in request order.
+        """
+        assignments: dict[str, AssignmentModel] = {}
+        uncached = []
+        for user_id in dict.fromkeys(user_ids):
+            cached_assignment = _assignment_cache.get((experiment_id, user_id))
+            if cached_assignment is not None:
+                assignments[user_id] = cached_assignment
+            else:
+                uncached.append(user_id)
+
+        if uncached:
+            experiment = await self._get_experiment_cached(experiment_id)
+            if not experiment:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Experiment {experiment_id} not found.",
+                )
 
-    def _filter_events(
-        self,
-        events: list[EventORM],
-        user_to_variant_assignment_lookup: dict[str, dict[str, str]],
-    ) -> list[EventORM]:
-        filtered_events: list[EventORM] = []
-        for event in events:
-            user_assignment_timestamp = user_to_variant_assignment_lookup[
-                event.user_id
-            ]["assignment_timestamp"]
-            if event.timestamp >= user_assignment_timestamp:
-                filtered_events.append(event)
-        return filtered_events
+            variant_ids_by_user = {
+                user_id: self._allocate_variant(experiment, user_id).variant_id
+                for user_id in uncached
+            }
+            for assignment in await self.assignment_repo.get_or_create_assignments_bulk(
+                experiment_id, variant_ids_by_user
+            ):
+                assignment_model = AssignmentModel.model_validate(assignment)
+                _assignment_cache[(experiment_id, assignment.user_id)] = (
+                    assignment_model
+                )
+                assignments[assignment.user_id] = assignment_model
+
+        return [assignments[user_id] for user_id in user_ids]
 
     def _generate_variant_agg_stats(
         self,
-        variant_orm: list[VariantORM],
-        assignment_orm: list[AssignmentORM],
-        experiment_events_orm: list[EventORM],
-        variant_id_to_variant: dict[str, VariantORM],
-        user_to_variant_assignment: dict[str, str],
+        variants: tuple[CachedVariant, ...],
+        assignment_counts: dict[str, int],
+        variant_aggregates: list[Row],
         primary_metric_name: str,
-    ):
-        # aggregate event stats on variant level, handle cases where variant has no assignments
+    ) -> tuple[dict, int, int]:
+        """
+        Builds the per-variant stats from the database aggregates in a single pass
+        over the rows, also returning the experiment's total events and converters.
+        """
+        # one entry per variant, so variants without assignments or events still report
         variant_stats = {}
-        for variant in variant_orm:
-            variant_stats[variant.variant_name] = {
-                "users": set(),
-                "event_type_counts": defaultdict(int),
-                "conversion_users": set(),
+        variant_id_to_stats = {}
+        for variant in variants:
+            stats = {
+                "total_assigned_users": assignment_counts.get(variant.variant_id, 0),
+                "conversion_rate": 0.0,
+                "conversion_count": 0,
+                "event_counts": {},
                 "metrics": {"total_revenue": 0.0},
                 "traffic_allocation": variant.traffic_allocation_percent,
             }
-
-        # pull out user counts per variant assignment
-        for assignment in assignment_orm:
-            variant_id = assignment.variant_id
-            variant = variant_id_to_variant[variant_id]
-            user_id = assignment.user_id
-            variant_stats[variant.variant_name]["users"].add(user_id)
-
-        # process events aggregate statistics per variant
-        for event in experiment_events_orm:
-            user_id = event.user_id
-            metric = event.type
-            variant_id = user_to_variant_assignment[user_id].get("variant_id")
-            variant = variant_id_to_variant.get(variant_id)
-
-            variant_stats[variant.variant_name]["event_type_counts"][metric] += 1
-
-            if metric == primary_metric_name:
-                variant_stats[variant.variant_name]["conversion_users"].add(user_id)
-
-            if metric == "purchase" and event.properties.get("price"):
-                variant_stats[variant.variant_name]["metrics"][
-                    "total_revenue"
-                ] += event.properties.get("price")
-
-        # structure aggregated variant stats
-        agg_variant_stats = {}
-        for variant_name, stats in variant_stats.items():
-            total_users = len(stats.get("users"))
-            conversion_users = len(stats.get("conversion_users"))
-            conversion_rate = (
-                conversion_users / total_users if total_users != 0 else 0.0
+            variant_stats[variant.variant_name] = stats
+            variant_id_to_stats[variant.variant_id] = stats
+
+        # fold the (variant, event type) aggregate rows computed by the database
+        total_events = 0
+        # every user belongs to exactly one variant, so per-variant distinct
+        # converters add up to the experiment-wide distinct count
+        total_converters = 0
+        for row in variant_aggregates:
+            stats = variant_id_to_stats[row.variant_id]
+            stats["event_counts"][row.type] = row.event_count
+            total_events += row.event_count
+            total_converters += row.conversion_users
+
+            if row.type == primary_metric_name:
+                stats["conversion_count"] = row.conversion_users
+
+            if row.type == "purchase":
+                stats["metrics"]["total_revenue"] = row.revenue
+
+        for stats in variant_stats.values():
+            total_users = stats["total_assigned_users"]
+            stats["conversion_rate"] = (
+                stats["conversion_count"] / total_users if total_users != 0 else 0.0
             )
 
-            agg_variant_stats[variant_name] = {
-                "total_assigned_users": total_users,
-                "conversion_rate": conversion_rate,
-                "conversion_count": conversion_users,
-                "event_counts": stats.get("event_type_counts"),
-                "metrics": stats.get("metrics"),
-                "traffic_allocation": stats.get("traffic_allocation"),
-            }
+        return variant_stats, total_events, total_converters
+
+    async def _get_variant_aggregates(
+        self, experiment: CachedExperiment, filter_params: dict[str, str]
+    ):
+        # on Postgres, unfiltered-by-date results come from the daily materialized view
+        # plus today's events; date ranges need the exact event timestamps
+        if (
+            self.db.get_bind().dialect.name == "postgresql"
+            and not filter_params.get("start_date")
+            and not filter_params.get("end_date")
+        ):
+            return await self.event_repo.get_variant_aggregates_materialized(
+                experiment.experiment_id,
+                experiment.primary_metric_name,
+                event_type=filter_params.get("event_type"),
+            )
 
-        return agg_variant_stats
+        return await self.event_repo.get_variant_aggregates(
+            experiment.experiment_id, experiment.primary_metric_name, **filter_params
+        )
 
-    def get_experiment_results(
+    async def get_experiment_results(
         self, experiment_id: str, filter_params: Optional[dict[str, str]] = None
     ):
-        experiment_orm = self.experiment_repo.get_experiment_with_variants(
-            experiment_id
-        )
+        cache_key = (experiment_id, tuple(sorted((filter_params or {}).items())))
+        cached_result = _results_cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+        experiment = await self._get_experiment_cached(experiment_id)
 
-        if not experiment_orm:
+        if not experiment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Experiment {experiment_id} not found.",
             )
 
-        # get associated data
-        variants_orm = experiment_orm.variants
-        assignment_orm = self.assignment_repo.get_assignments_for_experiment(
+        # aggregates are computed by the database; only O(variants * event types)
+        # rows come back instead of every assignment and event
+        variants = experiment.variants
+        assignment_counts = await self.assignment_repo.count_assignments_by_variant(
             experiment_id
         )
-        experiment_events_orm = self.event_repo.get_events_for_experiment(
-            experiment_id, **filter_params
-        )
-
-        # lookup tables
-        user_to_variant_assignment = {
-            assignment.user_id: {
-                "variant_id": assignment.variant_id,
-                "assignment_timestamp": assignment.assignment_timestamp,
-            }
-            for assignment in assignment_orm
-        }
-        variant_id_to_variant = {
-            variant.variant_id: variant for variant in variants_orm
-        }
-
-        # filter out events based on user assignment timestamp
-        filtered_events: list[EventORM] = self._filter_events(
-            experiment_events_orm, user_to_variant_assignment
+        variant_aggregates = await self._get_variant_aggregates(
+            experiment, filter_params or {}
         )
 
         # global experiment stats
-        days_running = (
-            (experiment_orm.end_time - experiment_orm.start_time).days
-            if experiment_orm.end_time and datetime.utcnow() > experiment_orm.end_time
-            else (datetime.utcnow() - experiment_orm.start_time).days
-        )
-        global_conversion_rate = (
-            len(
-                set(
-                    [
-                        event.user_id
-                        for event in filtered_events
-                        if event.type == experiment_orm.primary_metric_name
-                    ]
-                )
+        # timestamps are stored as naive UTC; utcnow() is deprecated since 3.12
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        # runs until end_time, or until now while the experiment has not ended
+        running_until = min(experiment.end_time, now) if experiment.end_time else now
+        days_running = (running_until - experiment.start_time).days
+        variant_agg_stats, total_events, total_converters = (
+            self._generate_variant_agg_stats(
+                variants,
+                assignment_counts,
+                variant_aggregates,
+                experiment.primary_metric_name,
             )
-            / len(assignment_orm)
-            if len(assignment_orm)
-            else 0.0
-        )
-
-        variant_agg_stats = self._generate_variant_agg_stats(
-            experiment_orm.variants,
-            assignment_orm,
-            experiment_events_orm,
-            variant_id_to_variant,
-            user_to_variant_assignment,
-            experiment_orm.primary_metric_name,
         )
+        total_users = sum(assignment_counts.values())
+        global_conversion_rate = total_converters / total_users if total_users else 0.0
 
         result = {
-            "name": experiment_orm.name,
-            "description": experiment_orm.description,
-            "start_time": experiment_orm.start_time,
-            "end_time": experiment_orm.end_time,
+            "name": experiment.name,
+            "description": experiment.description,
+            "start_time": experiment.start_time,
+            "end_time": experiment.end_time,
             "experiment_days_running": days_running,
-            "status": experiment_orm.status,
-            "total_variants": len(variants_orm),
-            "total_events": len(filtered_events),
-            "primary_metric_name": experiment_orm.primary_metric_name,
-            "total_users_in_experiment": len(assignment_orm),
+            "status": experiment.status,
+            "total_variants": len(variants),
+            "total_events": total_events,
+            "primary_metric_name": experiment.primary_metric_name,
+            "total_users_in_experiment": total_users,
             "global_conversion_rate": global_conversion_rate,
             # variant drill down stats
             "variant_stats": variant_agg_stats,
         }
 
+        _results_cache[cache_key] = result
         return result
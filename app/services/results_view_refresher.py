@@ -0,0 +1,64 @@
+# services/results_view_refresher.py
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.db import SessionLocal
+from app.core.settings import config_settings
+from app.repositories.event_repo import EventRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ResultsViewRefresher:
+    """
+    Periodically refreshes the experiment results materialized view.
+
+    The view only holds whole days before its last refresh, and readers add events
+    timestamped since then from the base tables. Events committed after a refresh
+    but timestamped before it (backdated client timestamps, or events that sat in
+    the batch writer's queue across the refresh) are missing from results until the
+    next refresh, so results can lag by up to the refresh interval. Runs on Postgres
+    only; elsewhere results are always computed from the base tables.
+    """
+
+    def __init__(
+        self, session_factory: async_sessionmaker[AsyncSession], interval: float
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Starts the background refresh task, if enabled for this database."""
+        if self.interval <= 0:
+            return
+        if self.session_factory.kw["bind"].dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with self.session_factory() as db:
+                    await EventRepository(db).refresh_variant_daily_view()
+            except Exception:
+                logger.exception("Refreshing mv_experiment_variant_daily failed")
+
+
+results_view_refresher = ResultsViewRefresher(
+    SessionLocal, config_settings.RESULTS_VIEW_REFRESH_SECONDS
+)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+# The app reads DATABASE_URL once, at import. Use a throwaway SQLite file rather than
+# :memory:, which the main and event engines would each open as a separate database.
+_db_dir = tempfile.mkdtemp(prefix="neonblue-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+
+import httpx
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+from app.core.db import SessionLocal, engine, events_engine
+from app.main import app
+from app.models.orm import assignment, event, experiment  # noqa: F401 (tables)
+from app.models.orm.base import Base
+from app.repositories import event_repo
+from app.services import experiment_service
+from app.models.schemas.experiment import ExperimentCreateModel, VariantConfig
+
+
+# The schema is Postgres-first; these two shims let create_all build it on SQLite.
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+# gen_random_uuid() does not exist on SQLite; the app always supplies event_id
+event.EventORM.__table__.c.event_id.server_default = None
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database(anyio_backend):
+    """An empty schema and empty per-process caches for each test."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    for cache in (
+        experiment_service._experiment_cache,
+        experiment_service._assignment_cache,
+        experiment_service._results_cache,
+        experiment_service._experiment_loads,
+        event_repo._event_type_ids,
+    ):
+        cache.clear()
+
+    yield
+
+    # pooled aiosqlite connections belong to this test's event loop
+    await engine.dispose()
+    await events_engine.dispose()
+
+
+@pytest.fixture
+async def db(database):
+    async with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client(database):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test",
+        headers={"Authorization": "Bearer token"},
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+async def running_experiment(db):
+    """A RUNNING 50/50 experiment whose primary metric is purchase."""
+    service = experiment_service.ExperimentService(db)
+    return await service.create_experiment(
+        ExperimentCreateModel(
+            name="checkout-button",
+            status="RUNNING",
+            primary_metric_name="purchase",
+            variants=[
+                VariantConfig(variant_name="control", traffic_allocation_percent=50),
+                VariantConfig(variant_name="treatment", traffic_allocation_percent=50),
+            ],
+        )
+    )
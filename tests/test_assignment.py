@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models.orm.assignment import AssignmentORM
+from app.repositories.assignment_repo import AssignmentRepository
+from app.services.experiment_service import (
+    ASSIGNMENT_BUCKETS,
+    CachedExperiment,
+    CachedVariant,
+    ExperimentService,
+    _build_routing_table,
+)
+
+
+def _threshold_variant(variants, bucket):
+    """The cumulative-threshold scan the routing table replaced, in basis points."""
+    cumulative_bps = 0
+    for variant in sorted(variants, key=lambda v: v.variant_name):
+        cumulative_bps += round(variant.traffic_allocation_percent * 100)
+        if bucket < cumulative_bps:
+            return variant
+
+
+def _cached_experiment(variants):
+    return CachedExperiment(
+        experiment_id="exp-1",
+        name="exp",
+        description=None,
+        status="RUNNING",
+        start_time=None,
+        end_time=None,
+        primary_metric_name="purchase",
+        variants=variants,
+        routing=_build_routing_table(variants),
+    )
+
+
+@pytest.mark.parametrize(
+    "allocations",
+    [
+        {"a": 50, "b": 50},
+        {"a": 33.33, "b": 33.33, "c": 33.34},
+        # declared out of name order: buckets are still split in variant_name order
+        {"treatment": 10, "control": 20, "holdout": 70},
+        {"a": 0, "b": 100},
+    ],
+)
+def test_routing_table_matches_threshold_scan(allocations):
+    variants = tuple(
+        CachedVariant(
+            variant_id=f"id-{name}",
+            variant_name=name,
+            traffic_allocation_percent=percent,
+        )
+        for name, percent in allocations.items()
+    )
+
+    routing = _build_routing_table(variants)
+
+    assert len(routing) == ASSIGNMENT_BUCKETS
+    for bucket in range(ASSIGNMENT_BUCKETS):
+        assert variants[routing[bucket]] == _threshold_variant(variants, bucket)
+
+
+def test_allocate_variant_is_deterministic():
+    variants = (
+        CachedVariant("id-a", "a", 50),
+        CachedVariant("id-b", "b", 50),
+    )
+    service = ExperimentService(db=None)
+
+    # a rebuilt snapshot of the same experiment assigns every user identically
+    first = _cached_experiment(variants)
+    second = _cached_experiment(variants)
+    user_ids = [f"user-{i}" for i in range(1000)]
+
+    assigned = [service._allocate_variant(first, user_id) for user_id in user_ids]
+
+    assert assigned == [service._allocate_variant(second, u) for u in user_ids]
+    assert {variant.variant_id for variant in assigned} == {"id-a", "id-b"}
+
+
+@pytest.mark.anyio
+async def test_get_or_create_assignment_is_idempotent(db, running_experiment):
+    repo = AssignmentRepository(db)
+    control, treatment = running_experiment.variants
+    experiment_id = running_experiment.experiment_id
+
+    created = await repo.get_or_create_assignment(
+        experiment_id, "user-1", control.variant_id
+    )
+    # the stored assignment wins over a different variant on later calls
+    again = await repo.get_or_create_assignment(
+        experiment_id, "user-1", treatment.variant_id
+    )
+
+    assert created.variant_id == again.variant_id == control.variant_id
+    assert await db.scalar(select(func.count()).select_from(AssignmentORM)) == 1
+
+
+@pytest.mark.anyio
+async def test_get_or_create_assignments_bulk_is_idempotent(db, running_experiment):
+    repo = AssignmentRepository(db)
+    control, treatment = running_experiment.variants
+    experiment_id = running_experiment.experiment_id
+    await repo.get_or_create_assignment(experiment_id, "user-0", treatment.variant_id)
+
+    requested = {f"user-{i}": control.variant_id for i in range(5)}
+    first = await repo.get_or_create_assignments_bulk(experiment_id, requested)
+    second = await repo.get_or_create_assignments_bulk(
+        experiment_id, {user_id: treatment.variant_id for user_id in requested}
+    )
+
+    expected = {user_id: control.variant_id for user_id in requested}
+    expected["user-0"] = treatment.variant_id
+    assert {a.user_id: a.variant_id for a in first} == expected
+    assert {a.user_id: a.variant_id for a in second} == expected
+    assert await db.scalar(select(func.count()).select_from(AssignmentORM)) == 5
+
+
+@pytest.mark.anyio
+async def test_service_assignment_is_stable(db, running_experiment):
+    service = ExperimentService(db)
+    experiment_id = running_experiment.experiment_id
+    user_ids = [f"user-{i}" for i in range(20)]
+
+    single = await service.get_user_assignment(experiment_id, "user-3")
+    bulk = await service.get_user_assignments_bulk(experiment_id, user_ids)
+
+    assert [a.user_id for a in bulk] == user_ids
+    assert bulk[3] == single
+    experiment = await service._get_experiment_cached(experiment_id)
+    for assignment in bulk:
+        expected = service._allocate_variant(experiment, assignment.user_id)
+        assert assignment.variant_id == expected.variant_id
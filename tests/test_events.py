@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.core.db import EventsSessionLocal
+from app.core.ids import uuid7
+from app.core.settings import config_settings
+from app.models.orm.event import EventORM, EventTypeORM
+from app.models.schemas.event import EventCreateModel
+from app.services.event_batch_writer import EventBatchWriter
+
+pytestmark = pytest.mark.anyio
+
+
+async def _type_names(db) -> set[str]:
+    return set((await db.scalars(select(EventTypeORM.name))).all())
+
+
+async def test_post_event_with_new_type(client, db):
+    response = await client.post(
+        "/events", json={"user_id": "user-1", "type": "first_seen"}
+    )
+
+    assert response.status_code == 201
+    assert await _type_names(db) == {"first_seen"}
+    assert await db.scalar(select(func.count()).select_from(EventORM)) == 1
+
+
+async def test_post_event_batch_with_new_types(client, db):
+    response = await client.post(
+        "/events/batch",
+        json=[
+            {"user_id": "user-1", "type": "click"},
+            {"user_id": "user-2", "type": "signup"},
+            {"user_id": "user-2", "type": "click"},
+        ],
+    )
+
+    assert response.status_code == 201
+    assert len(response.json()) == 3
+    assert await _type_names(db) == {"click", "signup"}
+
+
+async def test_batch_writer_with_new_type(database, db):
+    writer = EventBatchWriter(EventsSessionLocal)
+    await writer.start()
+    try:
+        await writer.submit(
+            EventCreateModel(user_id="user-1", type="queued"), event_id=uuid7()
+        )
+    finally:
+        await writer.stop()
+
+    assert await _type_names(db) == {"queued"}
+
+
+async def test_new_types_past_the_limit_are_rejected(client, db, monkeypatch):
+    monkeypatch.setattr(config_settings, "EVENT_TYPES_MAX", 1)
+
+    first = await client.post("/events", json={"user_id": "u", "type": "click"})
+    known = await client.post("/events", json={"user_id": "u", "type": "click"})
+    new = await client.post("/events", json={"user_id": "u", "type": "other"})
+
+    assert (first.status_code, known.status_code) == (201, 201)
+    assert new.status_code == 422
+    assert await _type_names(db) == {"click"}
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import event
+
+from app.core.db import engine
+from app.repositories.experiment_repo import ExperimentRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_experiment_with_variants_query_count(db, running_experiment):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.expunge_all()  # force a database read instead of an identity map hit
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        experiment = await ExperimentRepository(db).get_experiment_with_variants(
+            running_experiment.experiment_id
+        )
+        variant_names = sorted(v.variant_name for v in experiment.variants)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert variant_names == ["control", "treatment"]
+    assert len(statements) <= 2
+
+
+async def test_duplicate_experiment_name_is_rejected(client):
+    experiment = {
+        "name": "pricing-page",
+        "status": "RUNNING",
+        "primary_metric_name": "purchase",
+        "variants": [{"variant_name": "a", "traffic_allocation_percent": 100}],
+    }
+
+    created = await client.post("/experiments", json=experiment)
+    duplicate = await client.post("/experiments", json=experiment)
+
+    assert created.status_code == 201
+    assert duplicate.status_code == 400
+    # the database error (statement, parameters) is logged, never returned
+    assert duplicate.json() == {
+        "detail": "An experiment with this name already exists."
+    }
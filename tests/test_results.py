@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.schemas.event import EventCreateModel
+from app.repositories.event_repo import EventRepository
+from app.services.experiment_service import ExperimentService
+
+pytestmark = pytest.mark.anyio
+
+USER_IDS = [f"user-{i}" for i in range(10)]
+
+
+@pytest.fixture
+async def recorded_experiment(db, running_experiment):
+    """
+    Every assigned user clicks an hour after assignment; even-numbered users also
+    purchase (price 10 + i) an hour later. A click from before assignment and one
+    from an unassigned user must never be counted.
+    """
+    experiment_id = running_experiment.experiment_id
+    assignments = await ExperimentService(db).get_user_assignments_bulk(
+        experiment_id, USER_IDS
+    )
+    assigned_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def event(user_id, type, hours, **properties):
+        return EventCreateModel(
+            user_id=user_id,
+            type=type,
+            experiment_id=experiment_id,
+            timestamp=assigned_at + timedelta(hours=hours),
+            properties=properties,
+        )
+
+    events = [event("user-0", "click", hours=-24), event("stranger", "click", 1)]
+    for i, user_id in enumerate(USER_IDS):
+        events.append(event(user_id, "click", hours=1))
+        if i % 2 == 0:
+            events.append(event(user_id, "purchase", hours=2, price=10 + i))
+    await EventRepository(db).create_events_bulk(events)
+
+    names = {v.variant_id: v.variant_name for v in running_experiment.variants}
+    variant_by_user = {a.user_id: names[a.variant_id] for a in assignments}
+    return experiment_id, variant_by_user, assigned_at
+
+
+def _expected(variant_by_user, types):
+    expected = {
+        name: {"users": 0, "click": 0, "purchase": 0, "revenue": 0.0}
+        for name in ("control", "treatment")
+    }
+    for i, user_id in enumerate(USER_IDS):
+        stats = expected[variant_by_user[user_id]]
+        stats["users"] += 1
+        if "click" in types:
+            stats["click"] += 1
+        if "purchase" in types and i % 2 == 0:
+            stats["purchase"] += 1
+            stats["revenue"] += 10 + i
+    return expected
+
+
+def _assert_results(results, expected):
+    assert results["total_users_in_experiment"] == len(USER_IDS)
+    assert results["total_events"] == sum(
+        stats["click"] + stats["purchase"] for stats in expected.values()
+    )
+    for name, stats in expected.items():
+        variant = results["variant_stats"][name]
+        event_counts = {t: stats[t] for t in ("click", "purchase") if stats[t]}
+        assert variant["total_assigned_users"] == stats["users"]
+        assert variant["event_counts"] == event_counts
+        assert variant["conversion_count"] == stats["purchase"]
+        assert variant["conversion_rate"] == pytest.approx(
+            stats["purchase"] / stats["users"] if stats["users"] else 0.0
+        )
+        assert variant["metrics"]["total_revenue"] == pytest.approx(stats["revenue"])
+
+
+async def test_results_without_filters(client, recorded_experiment):
+    experiment_id, variant_by_user, _ = recorded_experiment
+
+    response = await client.get(f"/experiments/{experiment_id}/results")
+
+    assert response.status_code == 200
+    results = response.json()
+    _assert_results(results, _expected(variant_by_user, {"click", "purchase"}))
+    assert results["global_conversion_rate"] == pytest.approx(0.5)
+
+
+async def test_results_filtered_by_event_type(client, recorded_experiment):
+    experiment_id, variant_by_user, _ = recorded_experiment
+
+    response = await client.get(
+        f"/experiments/{experiment_id}/results", params={"event_type": "click"}
+    )
+
+    assert response.status_code == 200
+    _assert_results(response.json(), _expected(variant_by_user, {"click"}))
+
+
+@pytest.mark.parametrize(
+    "bound, types", [("start_date", {"purchase"}), ("end_date", {"click"})]
+)
+async def test_results_filtered_by_date(client, recorded_experiment, bound, types):
+    experiment_id, variant_by_user, assigned_at = recorded_experiment
+    # between the clicks (1h after assignment) and the purchases (2h)
+    cutoff = assigned_at + timedelta(minutes=90)
+
+    response = await client.get(
+        f"/experiments/{experiment_id}/results", params={bound: cutoff.isoformat()}
+    )
+
+    assert response.status_code == 200
+    _assert_results(response.json(), _expected(variant_by_user, types))
+
+
+async def test_results_for_unknown_experiment(client, database):
+    response = await client.get("/experiments/missing/results")
+
+    assert response.status_code == 404